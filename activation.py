@@ -0,0 +1,97 @@
+"""Активация профиля для одного терминала или проекта без записи в глобальный settings.json.
+
+Глобальный ~/.claude/settings.json один на всех: переключение в нем меняет
+профиль сразу всем запущенным claude. Здесь профиль применяется локально:
+
+- shell_exports() — строки для eval "$(ccc-hub env NAME)" в текущем терминале;
+- write_project_settings() — env в <проект>/.claude/settings.local.json,
+  который Claude Code ставит выше пользовательских настроек;
+- write_envrc() — блок для direnv в <проект>/.envrc.
+
+Все три строятся из core.profile_env, так что значения совпадают с тем, что
+записала бы обычная активация. Файлы с ключами создаются с правами 0600.
+"""
+
+import os
+import shlex
+from pathlib import Path
+
+from core import ClaudeSettingsWriter, JsonFileCache, profile_env
+from storage import atomic_write_text
+
+SHELLS = ("sh", "fish", "powershell")
+PROJECT_SETTINGS_PATH = Path(".claude") / "settings.local.json"
+ENVRC_NAME = ".envrc"
+# Границы блока в .envrc: остальное содержимое файла принадлежит пользователю.
+ENVRC_BEGIN = "# >>> ccc-hub >>>"
+ENVRC_END = "# <<< ccc-hub <<<"
+
+# Отдельный кэш: проектные файлы не должны вытеснять разобранный глобальный settings.json.
+_project_writer = ClaudeSettingsWriter(JsonFileCache())
+
+
+def _powershell_quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def shell_exports(model: dict, shell: str = "sh") -> str:
+    """Команды для eval. Пустые значения снимаются (unset), чтобы не остались от прошлого профиля."""
+    if shell not in SHELLS:
+        raise ValueError(f"Shell должен быть одним из: {', '.join(SHELLS)}")
+    lines = []
+    for key, value in profile_env(model).items():
+        value = str(value)
+        if shell == "fish":
+            lines.append(f"set -gx {key} {shlex.quote(value)}" if value else f"set -e {key}")
+        elif shell == "powershell":
+            if value:
+                lines.append(f"$env:{key} = {_powershell_quote(value)}")
+            else:
+                lines.append(f"Remove-Item Env:{key} -ErrorAction SilentlyContinue")
+        else:
+            lines.append(f"export {key}={shlex.quote(value)}" if value else f"unset {key}")
+    return "\n".join(lines) + "\n"
+
+
+def direnv_snippet(model: dict) -> str:
+    # Имя идет в комментарий .envrc: перевод строки в нем direnv выполнил бы как команду.
+    name = "".join(ch if ch.isprintable() else "?" for ch in str(model["name"]))
+    return f"{ENVRC_BEGIN}\n# профиль: {name}\n{shell_exports(model, 'sh')}{ENVRC_END}\n"
+
+
+def _create_private(path: Path) -> None:
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        os.close(fd)
+
+
+def write_project_settings(model: dict, project_dir: Path) -> Path:
+    """Пишет env профиля в .claude/settings.local.json проекта; прочие ключи файла сохраняются."""
+    path = Path(project_dir) / PROJECT_SETTINGS_PATH
+    # Пустой файл читается как {}: writer сам заполнит env и перенесет права 0600 на результат.
+    _create_private(path)
+    _project_writer.apply(path, lambda env: profile_env(model, env))
+    return path
+
+
+def write_envrc(model: dict, project_dir: Path) -> Path:
+    """Вставляет или заменяет блок ccc-hub в .envrc; после записи нужен `direnv allow`."""
+    path = Path(project_dir) / ENVRC_NAME
+    snippet = direnv_snippet(model)
+    try:
+        text = path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        _create_private(path)
+        text = ""
+    begin = text.find(ENVRC_BEGIN)
+    end = text.find(ENVRC_END, begin)
+    if begin != -1 and end != -1:
+        end += len(ENVRC_END)
+        if text[end : end + 1] == "\n":
+            end += 1
+        text = text[:begin] + snippet + text[end:]
+    else:
+        text += ("\n" if text and not text.endswith("\n") else "") + snippet
+    atomic_write_text(path, text)
+    return path
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Бенчмарк холодного старта cli.py.
+
+Падает (код 1), если в процесс CLI попал tkinter, PIL или pystray, либо если
+медиана времени запуска превысила бюджет. Запуск: make bench-cli.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CLI_PATH = ROOT / "cli.py"
+FORBIDDEN_MODULES = ("tkinter", "_tkinter", "PIL", "pystray")
+
+
+def _leaked_modules(command: list[str], env: dict) -> list[str]:
+    """Запускает CLI с -X importtime и возвращает запрещенные модули из лога импортов."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", str(CLI_PATH), *command],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    leaked = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        module = line.rsplit("|", 1)[-1].strip()
+        if module.split(".", 1)[0] in FORBIDDEN_MODULES:
+            leaked.add(module)
+    return sorted(leaked)
+
+
+def _time_runs(argv: list[str], env: dict, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(argv, env=env, capture_output=True, check=True)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="допустимая медиана запуска")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        # Отдельный HOME, чтобы не трогать реальные models.json и settings.json.
+        env = {**os.environ, "HOME": home, "USERPROFILE": home}
+        command = ["list"]
+        subprocess.run([sys.executable, str(CLI_PATH), *command], env=env, capture_output=True, check=True)
+
+        leaked = _leaked_modules(command, env)
+        timings = _time_runs([sys.executable, str(CLI_PATH), *command], env, args.runs)
+        baseline = _time_runs([sys.executable, "-c", "pass"], env, args.runs)
+
+    median = statistics.median(timings)
+    overhead = median - statistics.median(baseline)
+    print(f"cli list: median {median:.1f} ms, min {min(timings):.1f} ms, max {max(timings):.1f} ms")
+    print(f"overhead over bare interpreter: {overhead:.1f} ms")
+
+    failed = False
+    if leaked:
+        print(f"FAIL: GUI modules imported on the CLI path: {', '.join(leaked)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: median {median:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
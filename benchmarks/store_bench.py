@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""Бенчмарк хранилища профилей, записи settings.json и загрузки каталога.
+
+Заполняет ModelManager синтетическими хранилищами (по умолчанию 10, 1000 и
+10000 профилей) во временном HOME и замеряет _load, _save, add_model,
+set_active, _write_claude_settings и загрузку /v1/models с локального
+stub-сервера. Результат — JSON (--output); с --baseline сравнивает медианы с
+сохраненным прогоном и падает (код 1) при регрессии. Запуск: make bench-store.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib import parse as urllib_parse
+
+ROOT = Path(__file__).resolve().parent.parent
+CATALOG_PAGE_SIZE = 1000
+# Разница меньше этого порога считается шумом, даже если в процентах она большая:
+# у операций в доли миллисекунды разброс между прогонами того же дерева доходит до ~1 мс.
+NOISE_FLOOR_MS = 1.0
+
+
+def _synthetic_models(count: int, default_env: dict) -> list[dict]:
+    return [
+        {
+            **default_env,
+            "name": f"bench-{i:05d}",
+            "endpoint": f"https://gw{i % 17}.bench.invalid/api/anthropic",
+            "api_key": f"sk-bench-{i:05d}",
+        }
+        for i in range(count)
+    ]
+
+
+def _timed(func, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _summary(timings: list[float], ops: int = 1) -> dict:
+    per_op = [value / ops for value in timings]
+    return {
+        "median_ms": round(statistics.median(per_op), 4),
+        "min_ms": round(min(per_op), 4),
+        "max_ms": round(max(per_op), 4),
+        "runs": len(per_op),
+    }
+
+
+class _CatalogHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело уходят отдельными write: без TCP_NODELAY Nagle добавит ~40 мс к малым ответам.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        query = urllib_parse.parse_qs(urllib_parse.urlparse(self.path).query)
+        ids = self.server.model_ids
+        start = 0
+        if "after_id" in query:
+            start = self.server.positions.get(query["after_id"][0], -1) + 1
+        page = ids[start : start + CATALOG_PAGE_SIZE]
+        body = json.dumps(
+            {
+                "data": [{"type": "model", "id": model_id, "display_name": model_id} for model_id in page],
+                "has_more": start + CATALOG_PAGE_SIZE < len(ids),
+                "first_id": page[0] if page else None,
+                "last_id": page[-1] if page else None,
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _start_stub_server(model_count: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CatalogHandler)
+    server.daemon_threads = True
+    server.model_ids = [f"stub-model-{i:05d}" for i in range(model_count)]
+    server.positions = {model_id: index for index, model_id in enumerate(server.model_ids)}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _bench_size(size: int, repeat: int, workdir: Path) -> dict:
+    import core
+    from catalog_fetch import fetch_model_ids
+    from http_client import HttpClient
+
+    path = workdir / f"store-{size}" / "models.json"
+    path.parent.mkdir(parents=True)
+    models = _synthetic_models(size, core.DEFAULT_ENV)
+    path.write_text(json.dumps({"models": models, "active": models[0]["name"], "journal_seq": 0}, indent=2))
+    manager = core.ModelManager(path)
+    results = {}
+
+    results["load"] = _summary(_timed(manager._load, repeat))
+    results["save"] = _summary(_timed(manager._save, repeat))
+
+    add_ops = 50
+    counter = iter(range(10**9))
+
+    def add_batch():
+        for _ in range(add_ops):
+            manager.add_model({"name": f"added-{next(counter)}", "endpoint": "https://added.bench.invalid"})
+
+    results["add_model"] = _summary(_timed(add_batch, repeat), ops=add_ops)
+
+    names = [models[0]["name"], models[-1]["name"]]
+    toggle = iter(range(10**9))
+    results["set_active"] = _summary(_timed(lambda: manager.set_active(names[next(toggle) % 2]), repeat * 4))
+
+    first = manager.get_model(names[0])
+    second = manager.get_model(names[1])
+    manager._write_claude_settings(first)
+    results["write_settings_unchanged"] = _summary(
+        _timed(lambda: manager._write_claude_settings(first), repeat * 4)
+    )
+    flip = iter(range(10**9))
+    results["write_settings_changed"] = _summary(
+        _timed(lambda: manager._write_claude_settings(second if next(flip) % 2 else first), repeat * 4)
+    )
+
+    server = _start_stub_server(size)
+    client = HttpClient()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/models"
+    try:
+        fetched = fetch_model_ids(url, client=client)["model_ids"]
+        if len(fetched) != size:
+            raise RuntimeError(f"stub catalog returned {len(fetched)} ids, expected {size}")
+        results["fetch_models"] = _summary(_timed(lambda: fetch_model_ids(url, client=client), repeat))
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def _compare(current: dict, baseline: dict, tolerance: float, noise_floor_ms: float, log) -> list[str]:
+    regressions = []
+    for size, ops in current.items():
+        for op, stats in ops.items():
+            base = baseline.get(size, {}).get(op)
+            if not base:
+                continue
+            now_ms = stats["median_ms"]
+            base_ms = base["median_ms"]
+            ratio = now_ms / base_ms if base_ms else float("inf")
+            marker = ""
+            if ratio > 1 + tolerance and now_ms - base_ms > noise_floor_ms:
+                marker = "  REGRESSION"
+                regressions.append(f"{op}/{size}: {base_ms:.3f} -> {now_ms:.3f} ms ({ratio:.2f}x)")
+            print(f"  {op + '/' + size:<34} {base_ms:10.3f} -> {now_ms:10.3f} ms  {ratio:5.2f}x{marker}", file=log)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,1000,10000", help="размеры хранилищ через запятую")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="куда записать JSON с результатами (- для stdout)")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="допустимый рост медианы (0.5 = 50%%)")
+    parser.add_argument(
+        "--noise-floor-ms",
+        type=float,
+        default=NOISE_FLOOR_MS,
+        help="рост медианы меньше стольких мс не считается регрессией",
+    )
+    args = parser.parse_args()
+    # С --output - в stdout идет только JSON, чтобы его можно было разобрать; текст — в stderr.
+    log = sys.stderr if args.output == "-" else sys.stdout
+    sizes = [int(value) for value in args.sizes.split(",") if value.strip()]
+
+    with tempfile.TemporaryDirectory() as home:
+        # Отдельный HOME до импорта core: пути к models.json и settings.json считаются при импорте.
+        os.environ["HOME"] = home
+        os.environ["USERPROFILE"] = home
+        sys.path.insert(0, str(ROOT))
+        results = {}
+        for size in sizes:
+            results[str(size)] = _bench_size(size, args.repeat, Path(home))
+            for op, stats in results[str(size)].items():
+                label = f"{op}/{size}"
+                print(f"{label:<34} median {stats['median_ms']:10.3f} ms   min {stats['min_ms']:10.3f} ms", file=log)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if args.output == "-":
+        print(json.dumps(report, indent=2))
+    elif args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    if not args.baseline:
+        return 0
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")).get("results", {})
+    print(f"comparison with {args.baseline}:", file=log)
+    regressions = _compare(results, baseline, args.tolerance, args.noise_floor_ms, log)
+    if regressions:
+        print("FAIL: " + "; ".join(regressions), file=log)
+        return 1
+    print("OK", file=log)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
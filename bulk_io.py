@@ -0,0 +1,135 @@
+"""Потоковый импорт и экспорт профилей в JSON, JSON Lines и CSV.
+
+Файлы читаются по частям: записи отдаются ModelManager.import_models по одной,
+без загрузки всего файла в память. JSON может быть списком профилей или
+объектом с ключом "models" (так устроен models.json). В CSV пустая ячейка
+означает «значение по умолчанию», а столбцы совпадают с ключами профиля.
+"""
+
+import csv
+import json
+import sys
+from pathlib import Path
+
+from catalog_fetch import ModelPageParser
+from core import DEFAULT_ENV
+
+FORMATS = ("json", "jsonl", "csv")
+READ_CHUNK_SIZE = 64 * 1024
+_SUFFIX_FORMATS = {".json": "json", ".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv"}
+# Порядок столбцов CSV: сначала основные поля, потом переменные окружения.
+_LEADING_FIELDS = ("name", "endpoint", "api_key", *DEFAULT_ENV)
+
+
+def detect_format(path: str, fmt: str | None = None) -> str:
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Формат должен быть одним из: {', '.join(FORMATS)}")
+        return fmt
+    detected = _SUFFIX_FORMATS.get(Path(path).suffix.lower())
+    if detected is None:
+        raise ValueError(f"Не удалось определить формат по расширению {path}; укажите --format")
+    return detected
+
+
+def iter_records(path: str, fmt: str):
+    """Отдает пары (источник, запись); источник — номер строки или записи для отчета."""
+    if path == "-":
+        # stdin принадлежит процессу: читаем его, но не закрываем.
+        yield from _iter_stream(sys.stdin.buffer if fmt == "json" else sys.stdin, fmt)
+        return
+    if fmt == "json":
+        stream = open(path, "rb")
+    else:
+        stream = open(path, "r", encoding="utf-8-sig", newline="")
+    with stream:
+        yield from _iter_stream(stream, fmt)
+
+
+def _iter_stream(stream, fmt: str):
+    if fmt == "json":
+        return _iter_json(stream)
+    if fmt == "jsonl":
+        return _iter_jsonl(stream)
+    return _iter_csv(stream)
+
+
+def _iter_json(stream):
+    parser = ModelPageParser(array_key="models")
+    index = 0
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        rows = parser.feed(chunk) if chunk else parser.close()
+        for row in rows:
+            index += 1
+            yield f"запись {index}", row
+        if not chunk:
+            break
+    if not parser.array_found:
+        # Иначе объект без профилей (например, settings.json) тихо импортировал бы 0 записей.
+        raise ValueError('в JSON нет списка профилей: ожидается массив или объект с ключом "models"')
+
+
+def _iter_jsonl(stream):
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # Битая строка попадет в отчет как ошибка записи, остальные строки импортируются.
+            record = None
+        yield f"строка {line_no}", record
+
+
+def _iter_csv(stream):
+    reader = csv.DictReader(stream)
+    for row in reader:
+        record = {key: value for key, value in row.items() if key and value not in (None, "")}
+        yield f"строка {reader.line_num}", record
+
+
+def _csv_fields(models: list[dict], include_keys: bool) -> list[str]:
+    fields = list(_LEADING_FIELDS)
+    known = set(fields)
+    for model in models:
+        for key in model:
+            if key not in known:
+                known.add(key)
+                fields.append(key)
+    if not include_keys:
+        fields.remove("api_key")
+    return fields
+
+
+def write_records(path: str, models: list[dict], fmt: str, *, include_keys: bool = True) -> int:
+    """Пишет профили по одному, не собирая весь документ в памяти. Возвращает их число."""
+    stream = sys.stdout if path == "-" else open(path, "w", encoding="utf-8", newline="")
+    count = 0
+    try:
+        if fmt == "csv":
+            writer = csv.DictWriter(stream, fieldnames=_csv_fields(models, include_keys), extrasaction="ignore")
+            writer.writeheader()
+            for model in models:
+                writer.writerow(model)
+                count += 1
+            return count
+        if fmt == "json":
+            stream.write("[")
+        for model in models:
+            ordered = {key: model[key] for key in _LEADING_FIELDS if key in model}
+            ordered.update(model)
+            if not include_keys:
+                ordered.pop("api_key", None)
+            line = json.dumps(ordered, ensure_ascii=False)
+            if fmt == "json":
+                stream.write(("\n  " if count == 0 else ",\n  ") + line)
+            else:
+                stream.write(line + "\n")
+            count += 1
+        if fmt == "json":
+            stream.write("\n]\n")
+        return count
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
@@ -0,0 +1,109 @@
+"""Дисковый кэш каталогов /v1/models с TTL и условной ревалидацией.
+
+Кэш делят GUI и cli.py: чтение перечитывает файл, если его сменил другой
+процесс, а запись под межпроцессной блокировкой сначала подтягивает чужие
+записи и только потом добавляет свою, поэтому каталоги друг друга не теряются.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+
+from storage import FileLock, atomic_write_text, file_signature
+
+CATALOG_TTL_SECONDS = 6 * 60 * 60
+CATALOG_MAX_ENTRIES = 256
+
+
+class CatalogCache:
+    """Хранит списки id моделей по ключу «URL каталога + хэш API ключа».
+
+    Сам ключ в файл не попадает — только первые 16 символов его sha256.
+    Вместе со списком сохраняются ETag и Last-Modified для условных запросов.
+    """
+
+    def __init__(self, path: Path, ttl: float = CATALOG_TTL_SECONDS, max_entries: int = CATALOG_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.file_lock = FileLock(path.with_suffix(".lock"))
+        self._entries: dict[str, dict] | None = None
+        self._signature = None
+
+    @staticmethod
+    def make_key(url: str, api_key: str) -> str:
+        key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16] if api_key else "-"
+        return f"{url}#{key_hash}"
+
+    def _ensure_loaded(self) -> dict[str, dict]:
+        signature = file_signature(self.path)
+        if self._entries is None or signature != self._signature:
+            self._entries = {}
+            self._signature = signature
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            entries = data.get("entries", {}) if isinstance(data, dict) else {}
+            if isinstance(entries, dict):
+                self._entries = {
+                    key: entry
+                    for key, entry in entries.items()
+                    if isinstance(entry, dict) and isinstance(entry.get("model_ids"), list)
+                }
+        return self._entries
+
+    def _save(self) -> None:
+        entries = self._ensure_loaded()
+        if len(entries) > self.max_entries:
+            newest = sorted(entries.items(), key=lambda item: item[1].get("fetched_at", 0), reverse=True)
+            self._entries = entries = dict(newest[: self.max_entries])
+        atomic_write_text(self.path, json.dumps({"entries": entries}, ensure_ascii=False))
+        self._signature = file_signature(self.path)
+
+    def get(self, url: str, api_key: str) -> dict | None:
+        with self.lock:
+            entry = self._ensure_loaded().get(self.make_key(url, api_key))
+            if entry is None:
+                return None
+            return {**entry, "model_ids": list(entry["model_ids"])}
+
+    def entries(self) -> dict[str, dict]:
+        """Копия всех записей по ключу каталога (для построения индекса моделей)."""
+        with self.lock:
+            return {
+                key: {**entry, "model_ids": list(entry["model_ids"])} for key, entry in self._ensure_loaded().items()
+            }
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - float(entry.get("fetched_at", 0)) < self.ttl
+
+    def store(
+        self,
+        url: str,
+        api_key: str,
+        model_ids: list[str],
+        *,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        with self.lock, self.file_lock:
+            self._ensure_loaded()[self.make_key(url, api_key)] = {
+                "model_ids": list(model_ids),
+                "fetched_at": time.time(),
+                "etag": etag or "",
+                "last_modified": last_modified or "",
+            }
+            self._save()
+
+    def touch(self, url: str, api_key: str) -> None:
+        """Продлевает TTL записи после ответа 304 Not Modified."""
+        with self.lock, self.file_lock:
+            entry = self._ensure_loaded().get(self.make_key(url, api_key))
+            if entry is None:
+                return
+            entry["fetched_at"] = time.time()
+            self._save()
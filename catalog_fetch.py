@@ -0,0 +1,265 @@
+"""Потоковая загрузка каталога /v1/models с постраничной навигацией.
+
+Anthropic-совместимые API отдают список страницами: {"data": [...],
+"has_more": true, "last_id": "..."}; следующая страница запрашивается с
+after_id=<last_id>. Каждая страница разбирается по мере чтения тела, поэтому
+первые id доходят до интерфейса раньше, чем скачан весь каталог.
+"""
+
+import codecs
+import json
+import time
+from urllib import parse as urllib_parse
+
+from metrics import metrics
+from probe import ANTHROPIC_VERSION
+
+PAGE_LIMIT = 1000
+MAX_PAGES = 100
+READ_CHUNK_SIZE = 16 * 1024
+# Не чаще этого интервала отдаем промежуточный список, чтобы не заваливать GUI обновлениями.
+PROGRESS_INTERVAL = 0.1
+
+_WHITESPACE = " \t\r\n"
+_decoder = json.JSONDecoder()
+_INCOMPLETE = object()
+
+
+class ModelPageParser:
+    """Инкрементальный разбор одной страницы каталога.
+
+    feed() принимает очередной кусок тела и возвращает строки из "data",
+    которые успели прийти целиком. Остальные ключи верхнего уровня (has_more,
+    last_id и т.п.) собираются в meta. Поддерживается и ответ в виде голого списка.
+    Ключ массива можно сменить через array_key (bulk_io читает так "models").
+    """
+
+    def __init__(self, array_key: str = "data"):
+        self.array_key = array_key
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        # start -> key -> colon -> value -> comma -> ... -> done; в массиве data: item/item_comma.
+        self._state = "start"
+        self._key = None
+        self._top_list = False
+        self._eof = False
+        self.meta: dict = {}
+        # Был ли в документе сам массив строк (голый список или массив под array_key).
+        self.array_found = False
+
+    def feed(self, chunk: bytes) -> list:
+        self._buf = self._buf[self._pos :] + self._text_decoder.decode(chunk)
+        self._pos = 0
+        return self._parse()
+
+    def close(self) -> list:
+        """Дочитывает хвост; ValueError, если тело оборвано или это не JSON каталога."""
+        self._buf = self._buf[self._pos :] + self._text_decoder.decode(b"", final=True)
+        self._pos = 0
+        self._eof = True
+        rows = self._parse()
+        if self._state != "done":
+            raise ValueError("Некорректный формат JSON")
+        return rows
+
+    def _skip_ws(self) -> bool:
+        buf = self._buf
+        pos = self._pos
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        return pos < len(buf)
+
+    def _decode_value(self):
+        """Следующее JSON-значение или _INCOMPLETE, если оно еще не дошло целиком."""
+        try:
+            value, end = _decoder.raw_decode(self._buf, self._pos)
+        except ValueError:
+            if self._eof:
+                raise ValueError("Некорректный формат JSON") from None
+            return _INCOMPLETE
+        # Число или литерал на границе куска мог оборваться: ждем следующий символ.
+        if end >= len(self._buf) and not self._eof:
+            return _INCOMPLETE
+        self._pos = end
+        return value
+
+    def _expect(self, char: str) -> None:
+        if self._buf[self._pos] != char:
+            raise ValueError("Некорректный формат JSON")
+        self._pos += 1
+
+    def _parse(self) -> list:
+        rows = []
+        while self._state != "done" and self._skip_ws():
+            state = self._state
+            char = self._buf[self._pos]
+            if state == "start":
+                if char == "[":
+                    self._top_list = True
+                    self.array_found = True
+                    self._pos += 1
+                    self._state = "item_first"
+                else:
+                    self._expect("{")
+                    self._state = "key_first"
+            elif state in ("key_first", "key"):
+                if state == "key_first" and char == "}":
+                    self._pos += 1
+                    self._state = "done"
+                    continue
+                if char != '"':
+                    raise ValueError("Некорректный формат JSON")
+                key = self._decode_value()
+                if key is _INCOMPLETE:
+                    break
+                self._key = key
+                self._state = "colon"
+            elif state == "colon":
+                self._expect(":")
+                self._state = "value"
+            elif state == "value":
+                if self._key == self.array_key and char == "[":
+                    self.array_found = True
+                    self._pos += 1
+                    self._state = "item_first"
+                    continue
+                value = self._decode_value()
+                if value is _INCOMPLETE:
+                    break
+                self.meta[self._key] = value
+                self._state = "comma"
+            elif state == "comma":
+                if char == "}":
+                    self._pos += 1
+                    self._state = "done"
+                else:
+                    self._expect(",")
+                    self._state = "key"
+            elif state in ("item_first", "item"):
+                if state == "item_first" and char == "]":
+                    self._pos += 1
+                    self._state = "done" if self._top_list else "comma"
+                    continue
+                row = self._decode_value()
+                if row is _INCOMPLETE:
+                    break
+                rows.append(row)
+                self._state = "item_comma"
+            elif state == "item_comma":
+                if char == "]":
+                    self._pos += 1
+                    self._state = "done" if self._top_list else "comma"
+                else:
+                    self._expect(",")
+                    self._state = "item"
+        return rows
+
+
+def _page_url(url: str, after_id: str | None) -> str:
+    params = {"limit": PAGE_LIMIT}
+    if after_id:
+        params["after_id"] = after_id
+    separator = "&" if urllib_parse.urlparse(url).query else "?"
+    return f"{url}{separator}{urllib_parse.urlencode(params)}"
+
+
+def fetch_model_ids(
+    url: str,
+    api_key: str = "",
+    *,
+    proxy: str = "",
+    client=None,
+    cached: dict | None = None,
+    on_progress=None,
+) -> dict:
+    """Загружает все страницы каталога.
+
+    Возвращает {"model_ids", "etag", "last_modified", "not_modified", "truncated"}.
+    Для первой страницы отправляются If-None-Match/If-Modified-Since из cached; на
+    304 каталог считается неизменным и возвращаются id из кэша. on_progress(ids)
+    вызывается из потока загрузки с накопленным списком по мере разбора.
+    truncated=True — сервер обещал еще страницы, но загрузка остановилась
+    (MAX_PAGES или курсор не сдвинулся): такой список нельзя кэшировать как полный.
+    """
+    if client is None:
+        from http_client import shared_client
+
+        client = shared_client()
+    headers = {"anthropic-version": ANTHROPIC_VERSION, "Accept": "application/json"}
+    if api_key:
+        headers["x-api-key"] = api_key
+
+    model_ids: list[str] = []
+    seen: set[str] = set()
+    etag = last_modified = None
+    after_id = None
+    started = time.perf_counter()
+    last_emit = time.monotonic()
+    # Сбрасывается, только когда сервер сам сказал, что страниц больше нет.
+    truncated = True
+    for page in range(MAX_PAGES):
+        page_headers = dict(headers)
+        if page == 0 and cached:
+            if cached.get("etag"):
+                page_headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                page_headers["If-Modified-Since"] = cached["last_modified"]
+        parser = ModelPageParser()
+        last_row_id = None
+        metrics.inc("catalog_pages_total")
+        with client.get(_page_url(url, after_id), headers=page_headers, proxy=proxy) as response:
+            if page == 0:
+                if response.status == 304 and cached:
+                    metrics.inc("catalog_fetch_total", result="not_modified")
+                    metrics.observe("catalog_fetch_seconds", time.perf_counter() - started)
+                    return {
+                        "model_ids": list(cached["model_ids"]),
+                        "etag": cached.get("etag"),
+                        "last_modified": cached.get("last_modified"),
+                        "not_modified": True,
+                        "truncated": False,
+                    }
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+            response.raise_for_status()
+            while True:
+                # read1 отдает уже пришедшие байты: read ждал бы полные 16 КБ и задерживал строки.
+                chunk = response.read1(READ_CHUNK_SIZE)
+                rows = parser.feed(chunk) if chunk else parser.close()
+                for row in rows:
+                    model_id = row.get("id") if isinstance(row, dict) else None
+                    if model_id and model_id not in seen:
+                        seen.add(model_id)
+                        model_ids.append(model_id)
+                    if model_id:
+                        last_row_id = model_id
+                if on_progress is not None and rows and time.monotonic() - last_emit >= PROGRESS_INTERVAL:
+                    last_emit = time.monotonic()
+                    on_progress(list(model_ids))
+                if not chunk:
+                    break
+        if on_progress is not None and model_ids:
+            last_emit = time.monotonic()
+            on_progress(list(model_ids))
+        if parser.meta.get("has_more") is not True:
+            truncated = False
+            break
+        next_id = parser.meta.get("last_id") or last_row_id
+        # Курсор не сдвинулся — сервер зациклился бы на той же странице.
+        if not next_id or next_id == after_id:
+            break
+        after_id = str(next_id)
+
+    if not model_ids:
+        raise ValueError("Список моделей пуст или недоступен для этого ключа")
+    metrics.inc("catalog_fetch_total", result="truncated" if truncated else "ok")
+    metrics.observe("catalog_fetch_seconds", time.perf_counter() - started)
+    return {
+        "model_ids": model_ids,
+        "etag": etag,
+        "last_modified": last_modified,
+        "not_modified": False,
+        "truncated": truncated,
+    }
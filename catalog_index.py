@@ -0,0 +1,231 @@
+"""Обратный индекс «id модели -> каталоги, в которых она есть» по всем профилям.
+
+Каталог определяется так же, как в CatalogCache: URL /v1/models + хэш API
+ключа. В индекс попадает каждый загруженный каталог (диалог профиля, кнопка
+«Обновить каталоги», cli.py models --refresh); при повторной загрузке
+меняются только id, которые появились или пропали. Профили сопоставляются
+с каталогами в момент запроса, поэтому переименование профиля или новый
+профиль с тем же endpoint и ключом не требуют перестройки индекса.
+
+Файл ~/.config/ccc_hub/catalog_index.json хранит сам обратный индекс
+{"models": {id: [каталог, ...]}, "catalogs": {каталог: {"url", "updated"}}};
+прямое отображение каталог -> id восстанавливается из него при загрузке.
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from catalog_cache import CatalogCache
+from probe import build_models_url
+from storage import atomic_write_text, file_signature
+
+REFRESH_MAX_WORKERS = 8
+# Ключ считается на каждое нажатие клавиши для всех профилей: без памяти это разбор URL и sha256 на профиль.
+_KEY_MEMO_LIMIT = 4096
+_key_memo: dict[tuple[str, str], str | None] = {}
+
+
+def catalog_key_for(model) -> str | None:
+    """Ключ каталога профиля или None, если endpoint некорректен."""
+    endpoint = str(model.get("endpoint", ""))
+    api_key = str(model.get("api_key", "")).strip()
+    memo_key = (endpoint, api_key)
+    if memo_key in _key_memo:
+        return _key_memo[memo_key]
+    try:
+        key = CatalogCache.make_key(build_models_url(endpoint), api_key)
+    except ValueError:
+        key = None
+    if len(_key_memo) >= _KEY_MEMO_LIMIT:
+        _key_memo.clear()
+    _key_memo[memo_key] = key
+    return key
+
+
+class CatalogIndex:
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._models: dict[str, set[str]] | None = None
+        self._catalogs: dict[str, dict] = {}
+        self._forward: dict[str, set[str]] = {}
+        self._signature = None
+        self._search = None
+
+    def _ensure_loaded(self) -> dict[str, set[str]]:
+        # Индекс мог обновить другой процесс (cli.py models --refresh): перечитываем по stat.
+        if self._models is None or file_signature(self.path) != self._signature:
+            self._models = {}
+            self._forward = {}
+            self._search = None
+            self._signature = file_signature(self.path)
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            data = data if isinstance(data, dict) else {}
+            catalogs = data.get("catalogs")
+            self._catalogs = catalogs if isinstance(catalogs, dict) else {}
+            models = data.get("models")
+            for model_id, keys in (models.items() if isinstance(models, dict) else ()):
+                if isinstance(keys, list) and keys:
+                    self._models[model_id] = set(keys)
+                    for key in keys:
+                        self._forward.setdefault(key, set()).add(model_id)
+        return self._models
+
+    def _save(self) -> None:
+        data = {
+            "catalogs": self._catalogs,
+            "models": {model_id: sorted(keys) for model_id, keys in self._models.items()},
+        }
+        atomic_write_text(self.path, json.dumps(data, ensure_ascii=False), fsync=False)
+        self._signature = file_signature(self.path)
+
+    def is_empty(self) -> bool:
+        with self.lock:
+            return not self._ensure_loaded()
+
+    def update(self, url: str, api_key: str, model_ids) -> bool:
+        """Применяет свежий список каталога; True — если индекс изменился и был сохранен."""
+        key = CatalogCache.make_key(url, api_key)
+        with self.lock:
+            models = self._ensure_loaded()
+            old = self._forward.get(key, set())
+            new = set(model_ids)
+            added = new - old
+            removed = old - new
+            if not added and not removed and key in self._catalogs:
+                return False
+            ids_changed = False
+            for model_id in added:
+                keys = models.get(model_id)
+                if keys is None:
+                    keys = models[model_id] = set()
+                    ids_changed = True
+                keys.add(key)
+            for model_id in removed:
+                keys = models.get(model_id)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del models[model_id]
+                        ids_changed = True
+            if new:
+                self._forward[key] = new
+            else:
+                self._forward.pop(key, None)
+            self._catalogs[key] = {"url": url, "updated": time.time()}
+            if ids_changed:
+                # Поисковый индекс по id строится заново при следующем запросе.
+                self._search = None
+            self._save()
+            return True
+
+    def seed_from_cache(self, cache: CatalogCache) -> int:
+        """Заполняет пустой индекс каталогами, уже лежащими в кэше. Возвращает их число."""
+        entries = cache.entries()
+        with self.lock:
+            models = self._ensure_loaded()
+            if models:
+                return 0
+            for key, entry in entries.items():
+                for model_id in entry["model_ids"]:
+                    models.setdefault(model_id, set()).add(key)
+                self._forward[key] = set(entry["model_ids"])
+                self._catalogs[key] = {"url": key.rpartition("#")[0], "updated": entry.get("fetched_at", 0)}
+            self._search = None
+            if entries:
+                self._save()
+            return len(entries)
+
+    def model_ids(self) -> list[str]:
+        with self.lock:
+            return sorted(self._ensure_loaded())
+
+    def profiles_serving(self, model_id: str, profiles) -> list[str]:
+        """Имена профилей, в каталоге которых есть ровно этот id."""
+        with self.lock:
+            keys = set(self._ensure_loaded().get(model_id, ()))
+        return [m["name"] for m in profiles if catalog_key_for(m) in keys]
+
+    def query(self, text: str, profiles, limit: int = 200) -> dict[str, list[str]]:
+        """{id модели: [профили]} для id, подходящих под запрос (части id или слов в любом порядке).
+
+        Модели, которых нет ни у одного из переданных профилей, в ответ не попадают.
+        """
+        by_key: dict[str, list[str]] = {}
+        for model in profiles:
+            key = catalog_key_for(model)
+            if key is not None:
+                by_key.setdefault(key, []).append(model["name"])
+        with self.lock:
+            models = self._ensure_loaded()
+            if self._search is None:
+                from model_search import ModelIdIndex
+
+                self._search = ModelIdIndex(sorted(models))
+            search = self._search
+            matched = search.rank(search.match(text), text, limit=len(models)) if text.strip() else []
+            result = {}
+            for model_id in matched:
+                names = [name for key in sorted(models.get(model_id, ())) for name in by_key.get(key, ())]
+                if names:
+                    result[model_id] = names
+                    if len(result) >= limit:
+                        break
+        return result
+
+
+def refresh_catalogs(profiles, cache: CatalogCache, index: CatalogIndex, *, client=None) -> dict[str, str]:
+    """Загружает каталоги всех профилей параллельно, по одному запросу на каталог.
+
+    Условные запросы берутся из кэша, так что неизменный каталог стоит одного 304.
+    Возвращает {профиль: текст ошибки} для каталогов, которые не удалось получить.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from catalog_fetch import fetch_model_ids
+
+    targets: dict[str, tuple] = {}
+    owners: dict[str, list[str]] = {}
+    for model in profiles:
+        key = catalog_key_for(model)
+        if key is None:
+            continue
+        owners.setdefault(key, []).append(model["name"])
+        if key not in targets:
+            url = build_models_url(str(model.get("endpoint", "")))
+            targets[key] = (url, str(model.get("api_key", "")).strip(), str(model.get("HTTP_PROXY", "")))
+
+    def fetch(item):
+        key, (url, api_key, proxy) = item
+        cached = cache.get(url, api_key)
+        try:
+            result = fetch_model_ids(url, api_key, proxy=proxy, client=client, cached=cached)
+        except Exception as exc:
+            return key, str(exc) or exc.__class__.__name__
+        if result["truncated"]:
+            # Неполный каталог не должен вытеснить из кэша и индекса полный.
+            return key, f"каталог загружен не полностью ({len(result['model_ids'])} id)"
+        if result["not_modified"]:
+            cache.touch(url, api_key)
+        else:
+            cache.store(
+                url, api_key, result["model_ids"], etag=result["etag"], last_modified=result["last_modified"]
+            )
+        index.update(url, api_key, result["model_ids"])
+        return key, None
+
+    errors = {}
+    if not targets:
+        return errors
+    workers = max(1, min(REFRESH_MAX_WORKERS, len(targets)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="catalog") as pool:
+        for key, error in pool.map(fetch, targets.items()):
+            if error is not None:
+                for name in owners[key]:
+                    errors[name] = error
+    return errors
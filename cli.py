@@ -0,0 +1,309 @@
+"""Консольное переключение профилей без GUI.
+
+Примеры:
+    python cli.py list
+    python cli.py switch "Z.AI Claude Proxy"
+    python cli.py probe --json
+    python cli.py export "Local (Ollama)"
+    python cli.py failover
+    python cli.py gateway
+    python cli.py import team.csv --on-conflict replace
+    python cli.py export-profiles profiles.jsonl --without-keys
+    eval "$(python cli.py env "Local (Ollama)")"
+    python cli.py project "Z.AI Claude Proxy" --dir ~/work/repo --direnv
+    python cli.py models glm-4.7 --refresh
+
+Импортирует только core и probe: tkinter, PIL и pystray сюда попадать не должны,
+иначе холодный старт вырастает с десятков миллисекунд до сотен.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from core import DATA_PATH, ModelManager
+
+
+def _cmd_list(manager: ModelManager, args) -> int:
+    models, active = manager.snapshot()
+    if args.json:
+        rows = [{"name": m["name"], "endpoint": m.get("endpoint", ""), "active": m["name"] == active} for m in models]
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return 0
+    for model in models:
+        marker = "*" if model["name"] == active else " "
+        print(f"{marker} {model['name']}\t{model.get('endpoint', '')}")
+    return 0
+
+
+def _cmd_switch(manager: ModelManager, args) -> int:
+    if args.browserless:
+        target = manager.activate_browserless(args.name)
+    else:
+        target = manager.set_active(args.name)
+    print(f"Активная модель: {args.name} (настройки: {target})")
+    return 0
+
+
+def _cmd_export(manager: ModelManager, args) -> int:
+    model = manager.get_model(args.name)
+    if not model:
+        raise ValueError("Модель не найдена")
+    target = manager._write_claude_settings(model)
+    print(f"Настройки записаны в {target}. Перезапусти `claude` чтобы применить.")
+    return 0
+
+
+def _require_model(manager: ModelManager, name: str) -> dict:
+    model = manager.get_model(name)
+    if not model:
+        raise ValueError("Модель не найдена")
+    return model
+
+
+def _cmd_env(manager: ModelManager, args) -> int:
+    from activation import shell_exports
+
+    sys.stdout.write(shell_exports(_require_model(manager, args.name), args.shell))
+    return 0
+
+
+def _cmd_project(manager: ModelManager, args) -> int:
+    from activation import write_envrc, write_project_settings
+
+    model = _require_model(manager, args.name)
+    if args.direnv:
+        target = write_envrc(model, args.dir)
+        print(f"Блок ccc-hub записан в {target}. Выполни `direnv allow {args.dir}`.")
+    else:
+        target = write_project_settings(model, args.dir)
+        print(f"Профиль {args.name} записан в {target}; глобальный settings.json не изменен.")
+    return 0
+
+
+def _cmd_models(manager: ModelManager, args) -> int:
+    from catalog_cache import CatalogCache
+    from catalog_index import CatalogIndex, refresh_catalogs
+    from core import CATALOG_CACHE_PATH, CATALOG_INDEX_PATH
+
+    cache = CatalogCache(CATALOG_CACHE_PATH)
+    index = CatalogIndex(CATALOG_INDEX_PATH)
+    models = manager.list_models()
+    if args.refresh:
+        for name, error in sorted(refresh_catalogs(models, cache, index).items()):
+            print(f"{name}: каталог не загружен: {error}", file=sys.stderr)
+    elif index.is_empty():
+        index.seed_from_cache(cache)
+    matches = index.query(args.query, models, limit=args.limit)
+    if args.json:
+        print(json.dumps(matches, ensure_ascii=False, indent=2))
+    else:
+        for model_id, names in matches.items():
+            print(f"{model_id}\t{', '.join(names)}")
+    return 0 if matches else 2
+
+
+def _cmd_import(manager: ModelManager, args) -> int:
+    from bulk_io import detect_format, iter_records
+    from core import format_import_report
+
+    fmt = detect_format(args.path, args.format)
+    try:
+        report = manager.import_models(iter_records(args.path, fmt), on_conflict=args.on_conflict)
+    except OSError as exc:
+        raise ValueError(f"Не удалось прочитать {args.path}: {exc}") from exc
+    print(format_import_report(report))
+    return 2 if report["errors"] else 0
+
+
+def _cmd_export_profiles(manager: ModelManager, args) -> int:
+    from bulk_io import detect_format, write_records
+
+    fmt = detect_format(args.path, args.format)
+    count = write_records(args.path, manager.list_models(), fmt, include_keys=not args.without_keys)
+    if args.path != "-":
+        print(f"Экспортировано профилей: {count} -> {args.path}")
+    return 0
+
+
+def _format_ms(value: float | None) -> str:
+    return f"{value:.0f}" if value is not None else "-"
+
+
+def _cmd_probe(manager: ModelManager, args) -> int:
+    from probe import ProbeEngine
+
+    models = manager.list_models()
+    if args.names:
+        wanted = set(args.names)
+        missing = wanted - {m["name"] for m in models}
+        if missing:
+            raise ValueError(f"Модель не найдена: {', '.join(sorted(missing))}")
+        models = [m for m in models if m["name"] in wanted]
+    results = ProbeEngine(timeout=args.timeout).probe_all(models)
+    if args.json:
+        rows = [
+            {
+                "name": r.name,
+                "url": r.url,
+                "dns_ms": r.dns_ms,
+                "connect_ms": r.connect_ms,
+                "tls_ms": r.tls_ms,
+                "first_byte_ms": r.first_byte_ms,
+                "total_ms": r.total_ms,
+                "status": r.status,
+                "error": r.error,
+                "warm": r.warm,
+            }
+            for r in results
+        ]
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print("модель\tвсего\tdns\tconnect\ttls\tttfb\tстатус")
+        for r in sorted(results, key=lambda r: (r.total_ms is None, r.total_ms or 0)):
+            status = r.error if r.error else str(r.status or "")
+            print(
+                f"{r.name}\t{_format_ms(r.total_ms)}\t{_format_ms(r.dns_ms)}\t{_format_ms(r.connect_ms)}"
+                f"\t{_format_ms(r.tls_ms)}\t{_format_ms(r.first_byte_ms)}\t{status}"
+            )
+    return 0 if all(r.ok for r in results) else 2
+
+
+def _cmd_failover(manager: ModelManager, args) -> int:
+    from failover import FailoverConfig, FailoverRouter
+    from probe import ProbeEngine
+
+    config = FailoverConfig.load()
+    if len(config.group) < 2:
+        raise ValueError("В failover.json нужна группа (group) минимум из двух профилей")
+    router = FailoverRouter(
+        manager,
+        ProbeEngine(),
+        config,
+        on_switch=lambda previous, target, reason: print(f"{previous} -> {target}: {reason}", flush=True),
+    )
+    rounds = 0
+    try:
+        while True:
+            router.step()
+            rounds += 1
+            if args.rounds and rounds >= args.rounds:
+                break
+            time.sleep(config.interval_seconds)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _cmd_gateway(manager: ModelManager, args) -> int:
+    from gateway import LocalGateway, disable_gateway, ensure_gateway_config
+
+    if args.disable:
+        disable_gateway()
+        active = manager.active_model()
+        if active is not None:
+            manager._write_claude_settings(active)
+        print("Шлюз выключен, settings.json снова указывает на endpoint активного профиля.")
+        return 0
+    config = ensure_gateway_config(args.port)
+    gateway = LocalGateway(manager, config["token"], int(config["port"]))
+    try:
+        gateway.start()
+    except OSError as exc:
+        raise ValueError(f"Не удалось открыть порт {config['port']}: {exc}") from exc
+    active = manager.active_model()
+    if active is not None:
+        manager._write_claude_settings(active)
+    print(f"Шлюз слушает {gateway.base_url}; Ctrl+C — остановить.", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway.stop()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="ccc-hub", description="Переключатель моделей Claude Code без GUI")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = sub.add_parser("list", help="показать профили, * — активный")
+    list_parser.add_argument("--json", action="store_true", help="вывод в JSON")
+    list_parser.set_defaults(handler=_cmd_list)
+
+    switch_parser = sub.add_parser("switch", help="сделать профиль активным и записать settings.json")
+    switch_parser.add_argument("name")
+    switch_parser.add_argument("--browserless", action="store_true", help="режим без браузера (нужен API ключ)")
+    switch_parser.set_defaults(handler=_cmd_switch)
+
+    probe_parser = sub.add_parser("probe", help="замерить задержку endpoint-ов")
+    probe_parser.add_argument("names", nargs="*", help="профили (по умолчанию все)")
+    probe_parser.add_argument("--json", action="store_true", help="вывод в JSON")
+    probe_parser.add_argument("--timeout", type=float, default=8.0, help="таймаут на профиль, сек")
+    probe_parser.set_defaults(handler=_cmd_probe)
+
+    export_parser = sub.add_parser("export", help="записать профиль в settings.json, не меняя активный")
+    export_parser.add_argument("name")
+    export_parser.set_defaults(handler=_cmd_export)
+
+    env_parser = sub.add_parser("env", help="export-команды профиля для eval в текущем shell")
+    env_parser.add_argument("name")
+    env_parser.add_argument("--shell", choices=("sh", "fish", "powershell"), default="sh")
+    env_parser.set_defaults(handler=_cmd_env)
+
+    project_parser = sub.add_parser("project", help="профиль для одного проекта (.claude/settings.local.json)")
+    project_parser.add_argument("name")
+    project_parser.add_argument("--dir", default=".", help="каталог проекта (по умолчанию текущий)")
+    project_parser.add_argument("--direnv", action="store_true", help="записать блок в .envrc вместо settings")
+    project_parser.set_defaults(handler=_cmd_project)
+
+    models_parser = sub.add_parser("models", help="какие профили обслуживают модель (по загруженным каталогам)")
+    models_parser.add_argument("query", help="id модели или его часть; несколько слов — в любом порядке")
+    models_parser.add_argument("--refresh", action="store_true", help="сначала загрузить каталоги всех профилей")
+    models_parser.add_argument("--limit", type=int, default=200, help="не больше стольких моделей в ответе")
+    models_parser.add_argument("--json", action="store_true", help="вывод в JSON")
+    models_parser.set_defaults(handler=_cmd_models)
+
+    import_parser = sub.add_parser("import", help="массовый импорт профилей из JSON, JSONL или CSV")
+    import_parser.add_argument("path", help="файл или - для stdin")
+    import_parser.add_argument("--format", choices=("json", "jsonl", "csv"), help="по умолчанию по расширению")
+    import_parser.add_argument(
+        "--on-conflict",
+        choices=("skip", "replace", "error"),
+        default="skip",
+        help="что делать с уже существующими профилями (error — отменить весь импорт)",
+    )
+    import_parser.set_defaults(handler=_cmd_import)
+
+    export_all_parser = sub.add_parser("export-profiles", help="выгрузить все профили в JSON, JSONL или CSV")
+    export_all_parser.add_argument("path", help="файл или - для stdout")
+    export_all_parser.add_argument("--format", choices=("json", "jsonl", "csv"), help="по умолчанию по расширению")
+    export_all_parser.add_argument("--without-keys", action="store_true", help="не выгружать api_key")
+    export_all_parser.set_defaults(handler=_cmd_export_profiles)
+
+    failover_parser = sub.add_parser("failover", help="автопереключение внутри группы из failover.json")
+    failover_parser.add_argument("--rounds", type=int, default=0, help="число раундов (по умолчанию бесконечно)")
+    failover_parser.set_defaults(handler=_cmd_failover)
+
+    gateway_parser = sub.add_parser("gateway", help="локальный шлюз: переключение профиля без перезапуска claude")
+    gateway_parser.add_argument("--port", type=int, default=None, help="порт на 127.0.0.1 (по умолчанию 8787)")
+    gateway_parser.add_argument("--disable", action="store_true", help="выключить режим шлюза")
+    gateway_parser.set_defaults(handler=_cmd_gateway)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    manager = ModelManager(DATA_PATH)
+    try:
+        return args.handler(manager, args)
+    except ValueError as exc:
+        print(f"Ошибка: {exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,832 @@
+"""Хранилище профилей и запись настроек Claude Code без зависимостей от GUI.
+
+Модуль не должен импортировать tkinter, PIL или pystray: его использует
+консольная утилита cli.py, которой важен быстрый холодный старт.
+"""
+
+import copy
+import json
+import os
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+from pathlib import Path
+
+from metrics import metrics
+from storage import FileLock, MutationJournal, atomic_write_text, file_signature
+
+DATA_PATH = Path.home() / ".config" / "ccc_hub" / "models.json"
+CLAUDE_SETTINGS_PATH = Path.home() / ".claude" / "settings.json"
+CATALOG_CACHE_PATH = DATA_PATH.parent / "catalog_cache.json"
+CATALOG_INDEX_PATH = DATA_PATH.parent / "catalog_index.json"
+GATEWAY_CONFIG_PATH = DATA_PATH.parent / "gateway.json"
+GATEWAY_LOCK_PATH = DATA_PATH.parent / "gateway.lock"
+GATEWAY_DEFAULT_PORT = 8787
+# Псевдонимы моделей, которые видит claude в режиме шлюза; шлюз подменяет их моделями активного профиля.
+GATEWAY_MODEL_ALIASES = {
+    "ANTHROPIC_DEFAULT_HAIKU_MODEL": "ccc-haiku",
+    "ANTHROPIC_DEFAULT_SONNET_MODEL": "ccc-sonnet",
+    "ANTHROPIC_DEFAULT_OPUS_MODEL": "ccc-opus",
+}
+JOURNAL_COMPACT_THRESHOLD = 64
+IMPORT_CONFLICT_MODES = ("skip", "replace", "error")
+DEFAULT_ENV = {
+    "CLAUDE_CODE_ENABLE_TELEMETRY": "0",
+    "CLAUDE_CODE_DISABLE_NONESSENTIAL_TRAFFIC": "1",
+    "HTTP_PROXY": "",
+    "ANTHROPIC_API_KEY": "",
+    "ANTHROPIC_AUTH_TOKEN": "",
+    "ANTHROPIC_BASE_URL": "",
+    "ANTHROPIC_DEFAULT_HAIKU_MODEL": "glm-4.5-air",
+    "ANTHROPIC_DEFAULT_SONNET_MODEL": "glm-4.7",
+    "ANTHROPIC_DEFAULT_OPUS_MODEL": "glm-4.7",
+}
+DEFAULT_MODELS = [
+    {
+        "name": "Z.AI Claude Proxy",
+        "endpoint": "https://api.z.ai/api/anthropic",
+        "api_key": "your_zai_api_key",
+        **DEFAULT_ENV,
+    },
+    {
+        "name": "Local (Ollama)",
+        "endpoint": "http://localhost:11434/v1",
+        "api_key": "",
+        **{**DEFAULT_ENV, "ANTHROPIC_BASE_URL": "http://localhost:11434/v1"},
+    },
+]
+
+
+_MISSING = object()
+# Ключи, которые профиль никогда не наследует от основы.
+_OWN_KEYS = frozenset({"name", "base"})
+# Порядки ключей у профилей почти всегда совпадают: храним один общий кортеж на вариант.
+_KEY_LAYOUTS: dict[tuple, tuple] = {}
+
+
+class Profile(Mapping):
+    """Профиль, который хранит только отличия от DEFAULT_ENV или от профиля-основы.
+
+    Основа задается ключом "base" (имя другого профиля): все незаданные ключи,
+    кроме name, берутся у нее. Запись неизменяема; значения ищутся по цепочке
+    overrides -> основа -> DEFAULT_ENV при обращении, без копии полного словаря.
+    Порядок ключей вычисляется один раз и разделяется между профилями.
+    В models.json и журнал пишется только overrides.
+    """
+
+    __slots__ = ("overrides", "base", "_keys")
+
+    def __init__(self, overrides: dict, base: "Profile | None" = None):
+        self.overrides = overrides
+        self.base = base
+        self._keys = None
+
+    @classmethod
+    def from_values(cls, values: Mapping, base: "Profile | None" = None) -> "Profile":
+        """Строит профиль из полного набора значений, отбрасывая совпадающие с основой."""
+        parent = base if base is not None else DEFAULT_ENV
+        overrides = {}
+        for key, value in values.items():
+            if key in _OWN_KEYS or parent.get(key, _MISSING) != value:
+                overrides[key] = value
+        if base is None:
+            overrides.pop("base", None)
+        return cls(overrides, base)
+
+    @property
+    def name(self) -> str:
+        return self.overrides["name"]
+
+    @property
+    def base_name(self) -> str | None:
+        return self.overrides.get("base") or None
+
+    def _lookup(self, key, default=_MISSING):
+        value = self.overrides.get(key, _MISSING)
+        if value is not _MISSING or key in _OWN_KEYS:
+            return default if value is _MISSING else value
+        profile = self.base
+        while profile is not None:
+            value = profile.overrides.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            profile = profile.base
+        return DEFAULT_ENV.get(key, default)
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        return self._lookup(key, default)
+
+    def __contains__(self, key) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def _layout(self) -> tuple:
+        if self._keys is None:
+            inherited = [key for key in self.base._layout() if key not in _OWN_KEYS] if self.base is not None else []
+            layout = tuple(dict.fromkeys([*DEFAULT_ENV, *inherited, *self.overrides]))
+            self._keys = _KEY_LAYOUTS.setdefault(layout, layout)
+        return self._keys
+
+    def __iter__(self):
+        return iter(self._layout())
+
+    def __len__(self) -> int:
+        return len(self._layout())
+
+    def __repr__(self) -> str:
+        return f"Profile({self.overrides!r})"
+
+
+def link_profiles(raw: dict, *, compact: bool = True) -> dict:
+    """Превращает {имя: значения} в {имя: Profile}, связывая профили с основами.
+
+    compact=True отбрасывает значения, совпадающие с основой (так читаются и
+    старые полные записи). Ссылка на несуществующую основу или цикл разрываются:
+    такой профиль считается от DEFAULT_ENV.
+    """
+    built: dict[str, Profile] = {}
+
+    def build(name: str, chain: tuple) -> Profile:
+        profile = built.get(name)
+        if profile is not None:
+            return profile
+        values = raw[name]
+        base_name = values.get("base")
+        base = None
+        if base_name in raw and base_name != name and base_name not in chain:
+            base = build(base_name, (*chain, name))
+        if compact:
+            profile = Profile.from_values(values, base)
+        else:
+            overrides = dict(values.overrides if isinstance(values, Profile) else values)
+            if base is None:
+                overrides.pop("base", None)
+            profile = Profile(overrides, base)
+        built[name] = profile
+        return profile
+
+    for name in raw:
+        build(name, ())
+    return {name: built[name] for name in raw}
+
+
+def _check_profile_name(name: str) -> None:
+    # Имя попадает в меню, CSV и комментарии .envrc: перевод строки там превратился бы в команду.
+    if not name.isprintable():
+        raise ValueError("Название профиля не может содержать переводы строк и управляющие символы")
+
+
+def _base_chain_error(raw: dict, name: str) -> str | None:
+    """Почему профиль name из {имя: значения} нельзя связать с основами; None — если можно."""
+    seen = {name}
+    values = raw[name]
+    has_endpoint = bool(str(values.get("endpoint", "")).strip())
+    while values.get("base"):
+        base_name = values["base"]
+        if base_name not in raw:
+            return f"базовый профиль {base_name} не найден"
+        if base_name in seen:
+            return f"цепочка основ замыкается на профиле {base_name}"
+        seen.add(base_name)
+        values = raw[base_name]
+        has_endpoint = has_endpoint or bool(str(values.get("endpoint", "")).strip())
+    return None if has_endpoint else "не задан endpoint ни у профиля, ни у его основ"
+
+
+class JsonFileCache:
+    """Разобранная копия JSON-файла; перечитывается, только если сменились mtime, размер или inode."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._path = None
+        self._signature = None
+        self._data: dict = {}
+
+    def read(self, path: Path) -> dict:
+        signature = file_signature(path)
+        if signature is None:
+            return {}
+        with self.lock:
+            if self._path != path or self._signature != signature:
+                try:
+                    data = json.loads(path.read_text(encoding="utf-8"))
+                except Exception:
+                    data = {}
+                self._path = path
+                self._signature = signature
+                self._data = data if isinstance(data, dict) else {}
+            return copy.deepcopy(self._data)
+
+    def remember(self, path: Path, data: dict) -> None:
+        """Запоминает только что записанное содержимое, чтобы не разбирать его заново."""
+        with self.lock:
+            self._path = path
+            self._signature = file_signature(path)
+            self._data = copy.deepcopy(data)
+
+
+_settings_cache = JsonFileCache()
+
+
+class ClaudeSettingsWriter:
+    """Записывает env-блок в settings.json, только если он действительно меняется.
+
+    Каждая перезапись будит наблюдателей за файлом в запущенных процессах claude,
+    поэтому одинаковый результат не пишется вовсе. Запись атомарная; прочие ключи
+    и их порядок сохраняются, новые переменные добавляются в конец env.
+    """
+
+    def __init__(self, cache: JsonFileCache):
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.skipped = 0
+
+    @staticmethod
+    def diff(data: dict, env_updates: dict, extra: dict) -> tuple[dict, dict]:
+        env = data.get("env")
+        env = env if isinstance(env, dict) else {}
+        env_diff = {k: v for k, v in env_updates.items() if k not in env or env[k] != v}
+        extra_diff = {k: v for k, v in extra.items() if k not in data or data[k] != v}
+        return env_diff, extra_diff
+
+    def apply(self, path: Path, build_env, extra: dict | None = None) -> bool:
+        """build_env(текущий env) -> новые значения. Возвращает True, если файл был записан."""
+        extra = extra or {}
+        with self.lock:
+            data = self.cache.read(path)
+            env = data.get("env")
+            if not isinstance(env, dict):
+                env = {}
+            env_diff, extra_diff = self.diff(data, build_env(env), extra)
+            if not env_diff and not extra_diff and isinstance(data.get("env"), dict) and path.exists():
+                self.skipped += 1
+                metrics.inc("settings_writes_skipped_total")
+                return False
+            env.update(env_diff)
+            data["env"] = env
+            data.update(extra_diff)
+            with metrics.timer("settings_write_seconds"):
+                atomic_write_text(path, json.dumps(data, indent=2))
+            self.cache.remember(path, data)
+            self.writes += 1
+            metrics.inc("settings_writes_total")
+            return True
+
+
+settings_writer = ClaudeSettingsWriter(_settings_cache)
+
+
+_gateway_cache = JsonFileCache()
+
+
+def read_gateway_config() -> dict:
+    """Настройки локального шлюза: {"enabled", "port", "token"}; пустой dict, если шлюз не настроен."""
+    return _gateway_cache.read(GATEWAY_CONFIG_PATH)
+
+
+def gateway_running() -> bool:
+    """True, если запущенный шлюз держит gateway.lock. Блокировку снимает ОС при смерти процесса,
+    поэтому упавший шлюз не оставляет ложного признака жизни."""
+    if not GATEWAY_LOCK_PATH.exists():
+        return False
+    probe = FileLock(GATEWAY_LOCK_PATH)
+    try:
+        if not probe.try_acquire():
+            return True
+        probe.release()
+        return False
+    finally:
+        probe.close()
+
+
+def gateway_base_url(config: dict) -> str:
+    return f"http://127.0.0.1:{int(config.get('port') or GATEWAY_DEFAULT_PORT)}"
+
+
+def format_import_report(report: dict, limit: int = 20) -> str:
+    """Сводка импорта и первые limit проблемных записей."""
+    lines = [
+        f"добавлено: {report['added']}, заменено: {report['replaced']}, "
+        f"пропущено: {len(report['skipped'])}, ошибок: {len(report['errors'])}"
+    ]
+    problems = [f"  {source}: {message}" for source, message in report["errors"]]
+    problems += [f"  {source}: {name} — {reason}" for source, name, reason in report["skipped"]]
+    lines.extend(problems[:limit])
+    if len(problems) > limit:
+        lines.append(f"  ... и еще {len(problems) - limit}")
+    return "\n".join(lines)
+
+
+def profile_env(model: dict, current_env: dict | None = None, *, force_api_key_auth: bool = False) -> dict:
+    """Переменные окружения Claude Code для профиля — общая основа для всех способов активации.
+
+    current_env — env, который уже лежит в целевом файле: если у профиля пустой
+    ключ, оттуда сохраняется текущий токен, чтобы не ломать пройденную OAuth-авторизацию.
+    """
+    current_env = current_env or {}
+    model_api_key = str(model.get("api_key", "")).strip()
+    existing_auth_token = str(current_env.get("ANTHROPIC_AUTH_TOKEN", "")).strip()
+    existing_api_key = str(current_env.get("ANTHROPIC_API_KEY", "")).strip()
+    auth_token = model_api_key or existing_auth_token
+    api_key = model_api_key or existing_api_key
+    if force_api_key_auth:
+        auth_token = api_key = model_api_key
+    return {
+        "CLAUDE_CODE_ENABLE_TELEMETRY": model.get("CLAUDE_CODE_ENABLE_TELEMETRY", ""),
+        "CLAUDE_CODE_DISABLE_NONESSENTIAL_TRAFFIC": model.get("CLAUDE_CODE_DISABLE_NONESSENTIAL_TRAFFIC", ""),
+        "HTTP_PROXY": model.get("HTTP_PROXY", ""),
+        "ANTHROPIC_API_KEY": api_key,
+        "ANTHROPIC_AUTH_TOKEN": auth_token,
+        "ANTHROPIC_BASE_URL": model.get("endpoint", ""),
+        "ANTHROPIC_DEFAULT_HAIKU_MODEL": model.get("ANTHROPIC_DEFAULT_HAIKU_MODEL", ""),
+        "ANTHROPIC_DEFAULT_SONNET_MODEL": model.get("ANTHROPIC_DEFAULT_SONNET_MODEL", ""),
+        "ANTHROPIC_DEFAULT_OPUS_MODEL": model.get("ANTHROPIC_DEFAULT_OPUS_MODEL", ""),
+    }
+
+
+def _read_claude_env() -> dict:
+    env = _settings_cache.read(CLAUDE_SETTINGS_PATH).get("env", {})
+    return env if isinstance(env, dict) else {}
+
+
+def _has_claude_auth_token() -> bool:
+    env = _read_claude_env()
+    auth_token = env.get("ANTHROPIC_AUTH_TOKEN", "")
+    api_key = env.get("ANTHROPIC_API_KEY", "")
+    return bool(str(auth_token).strip() or str(api_key).strip())
+
+
+class ModelManager:
+    """Профили в models.json (снимок) и models.journal (дописываемые мутации).
+
+    Хранилище могут менять несколько процессов сразу: GUI, cli.py, скрипты.
+    journal_seq снимка и seq записей журнала — сквозной номер версии. Каждая
+    мутация под межпроцессной блокировкой models.lock сначала догоняет
+    состояние на диске, затем применяет свою операцию к свежим данным и
+    дописывает ее со следующим номером, поэтому чужие изменения не затираются.
+    Блокировка держится только на время этой проверки и дозаписи.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file_lock = FileLock(path.with_suffix(".lock"))
+        # Упорядоченный индекс по имени: порядок вставки = порядок в списке моделей.
+        self._models: dict[str, dict] = {}
+        self.active = None
+        self.journal = MutationJournal(path.with_suffix(".journal"))
+        self._seq = 0
+        self._known_signature = None
+        with self.file_lock:
+            self._load()
+
+    @property
+    def models(self) -> list[dict]:
+        return list(self._models.values())
+
+    def _load(self) -> None:
+        with metrics.timer("store_load_seconds"):
+            self._load_snapshot()
+
+    def _load_snapshot(self) -> None:
+        if not self.path.exists():
+            self._models = link_profiles({m["name"]: m for m in DEFAULT_MODELS})
+            self.active = next(iter(self._models), None)
+            self._save()
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            # Битый снимок не перезаписываем молча: откладываем его рядом для ручного разбора.
+            os.replace(self.path, self.path.with_suffix(".json.corrupt"))
+            data = {}
+        self._seq = int(data.get("journal_seq", 0) or 0)
+        raw_models = data.get("models", [])
+        raw_models = raw_models if isinstance(raw_models, list) else []
+        raw_active = data.get("active")
+
+        index = {}
+        for m in raw_models:
+            if isinstance(m, dict) and m.get("name") and (m.get("endpoint") or m.get("base")):
+                index.setdefault(m["name"], m)
+        dropped = len(index) != len(raw_models)
+
+        entries, journal_clean = self.journal.read()
+        replayed = 0
+        for entry in entries:
+            seq = entry.get("seq", 0)
+            if not isinstance(seq, int) or seq <= self._seq:
+                continue
+            index = self._replay_entry(index, entry)
+            raw_active = entry.get("active", raw_active)
+            self._seq = seq
+            replayed += 1
+
+        self._models = link_profiles(index)
+        if not self._models:
+            self._models = link_profiles({m["name"]: m for m in DEFAULT_MODELS})
+        self.active = raw_active
+        if self.active not in self._models:
+            self.active = next(iter(self._models), None)
+
+        # Неизмененное хранилище при старте не переписываем; старые полные записи ужимаются один раз.
+        normalized_changed = (
+            dropped
+            or [m.overrides for m in self._models.values()] != list(index.values())
+            or self.active != raw_active
+        )
+        if (
+            normalized_changed
+            or not journal_clean
+            or replayed < len(entries)
+            or len(entries) >= JOURNAL_COMPACT_THRESHOLD
+        ):
+            self._save()
+        self._known_signature = self._disk_signature()
+
+    def _disk_signature(self) -> tuple:
+        return file_signature(self.path), file_signature(self.journal.path)
+
+    def reload_if_changed(self) -> bool:
+        """Подхватывает изменения, сделанные другим процессом. True — если состояние изменилось.
+
+        Если другой процесс только дописал журнал, применяются лишь новые записи;
+        замена снимка (компакция или ручная правка) приводит к полной перезагрузке.
+        """
+        with self.lock:
+            # Быстрый путь без межпроцессной блокировки: на диске ничего не менялось.
+            if self._disk_signature() == self._known_signature:
+                return False
+            with self._file_locked():
+                return self._catch_up()
+
+    @contextmanager
+    def _file_locked(self):
+        with metrics.timer("store_lock_wait_seconds"):
+            self.file_lock.acquire()
+        try:
+            yield
+        finally:
+            self.file_lock.release()
+
+    @contextmanager
+    def _transaction(self):
+        """Мутация: блокировки потока и файла, затем догоняем версию на диске."""
+        with self.lock, self._file_locked():
+            self._catch_up()
+            yield
+
+    def _catch_up(self) -> bool:
+        """Вызывается под обеими блокировками; True — если состояние изменилось."""
+        signature = self._disk_signature()
+        if signature == self._known_signature:
+            return False
+        metrics.inc("store_reloads_total")
+        before = (self.models, self.active)
+        if signature[0] is not None and signature[0] == self._known_signature[0]:
+            self._apply_journal_tail()
+            self._known_signature = signature
+        else:
+            self._load()
+        return (self.models, self.active) != before
+
+    def _apply_journal_tail(self) -> None:
+        entries, _ = self.journal.read()
+        touched = set()
+        for entry in entries:
+            seq = entry.get("seq", 0)
+            if not isinstance(seq, int) or seq <= self._seq:
+                continue
+            model = entry.get("model")
+            if isinstance(model, dict) and model.get("name"):
+                entry = {**entry, "model": Profile(model, self._models.get(model.get("base")))}
+                touched.add(model["name"])
+            touched.add(entry.get("name"))
+            self._models = self._replay_entry(self._models, entry)
+            self.active = entry.get("active", self.active)
+            self._seq = seq
+        self._relink_dependents(touched)
+        if self.active not in self._models:
+            self.active = next(iter(self._models), None)
+
+    @staticmethod
+    def _replace_in_index(index: dict, old_name: str, model: dict) -> dict:
+        """Заменяет запись, сохраняя ее позицию; перестраивает индекс только при переименовании."""
+        if model["name"] == old_name:
+            index[old_name] = model
+            return index
+        return {
+            (model["name"] if name == old_name else name): (model if name == old_name else m)
+            for name, m in index.items()
+        }
+
+    @classmethod
+    def _replay_entry(cls, index: dict, entry: dict) -> dict:
+        op = entry.get("op")
+        model = entry.get("model")
+        if op == "add" and isinstance(model, Mapping) and model.get("name"):
+            index[model["name"]] = model
+        elif op == "update" and isinstance(model, Mapping) and model.get("name") and entry.get("name") in index:
+            index = cls._replace_in_index(index, entry["name"], model)
+        elif op == "remove":
+            index.pop(entry.get("name"), None)
+        return index
+
+    def _save(self) -> None:
+        """Пишет полный снимок атомарно и сбрасывает журнал (компакция)."""
+        with metrics.timer("store_save_seconds"):
+            models = [m.overrides for m in self._models.values()]
+            snapshot = {"models": models, "active": self.active, "journal_seq": self._seq}
+            atomic_write_text(self.path, json.dumps(snapshot, indent=2))
+            self.journal.reset()
+        self._known_signature = self._disk_signature()
+
+    def _commit(self, entry: dict) -> None:
+        """Дописывает одну мутацию в журнал; при накоплении записей делает компакцию."""
+        self._seq += 1
+        with metrics.timer("store_journal_append_seconds"):
+            self.journal.append({**entry, "seq": self._seq, "active": self.active})
+        if len(self.journal) >= JOURNAL_COMPACT_THRESHOLD:
+            self._save()
+        else:
+            self._known_signature = self._disk_signature()
+
+    def compact(self) -> None:
+        with self._transaction():
+            if len(self.journal):
+                self._save()
+
+    def list_models(self):
+        with self.lock:
+            return list(self._models.values())
+
+    def snapshot(self) -> tuple[list[dict], str | None]:
+        """Список моделей и активное имя за одно взятие блокировки."""
+        with self.lock:
+            return list(self._models.values()), self.active
+
+    def get_model(self, name: str) -> dict | None:
+        with self.lock:
+            return self._models.get(name)
+
+    def active_model(self) -> dict | None:
+        with self.lock:
+            return self._models.get(self.active) if self.active is not None else None
+
+    def add_model(self, model):
+        with self._transaction():
+            model = self._normalize_model(model)
+            if model["name"] in self._models:
+                raise ValueError(f"Модель {model['name']} уже существует")
+            self._models[model["name"]] = model
+            if not self.active:
+                self.active = model["name"]
+            self._commit({"op": "add", "model": model.overrides})
+
+    def import_models(self, records, on_conflict: str = "skip") -> dict:
+        """Массовый импорт: вся пачка проверяется, конфликты собираются в один отчет,
+        а результат записывается одним снимком вместо записи в журнал на каждый профиль.
+
+        records — итерируемое пар (источник, запись); источник (номер строки или записи)
+        попадает в отчет. on_conflict: "skip" — оставить существующий профиль,
+        "replace" — заменить его, "error" — при любой ошибке или конфликте ничего не менять.
+        """
+        if on_conflict not in IMPORT_CONFLICT_MODES:
+            raise ValueError(f"on_conflict должен быть одним из: {', '.join(IMPORT_CONFLICT_MODES)}")
+        report = {"added": 0, "replaced": 0, "skipped": [], "errors": []}
+        staged: dict[str, tuple] = {}
+        # Разбор и проверка идут без блокировки: GUI может читать профили во время импорта.
+        for source, record in records:
+            try:
+                model = self._validate_import_record(record)
+            except ValueError as exc:
+                report["errors"].append((source, str(exc)))
+                continue
+            if model["name"] in staged:
+                report["skipped"].append((source, model["name"], "повторяется в файле"))
+                continue
+            staged[model["name"]] = (source, model)
+
+        with self._transaction():
+            accepted = []
+            for name, (source, model) in staged.items():
+                if name in self._models and on_conflict != "replace":
+                    report["skipped"].append((source, name, "профиль уже существует"))
+                    continue
+                accepted.append(model)
+            raw = {name: m.overrides for name, m in self._models.items()}
+            # Основы проверяются на всей пачке вместе с хранилищем: отбракованная запись
+            # может оставить без основы другую запись пачки, поэтому повторяем до неподвижной точки.
+            while True:
+                candidate = {**raw, **{model["name"]: model for model in accepted}}
+                failed = {}
+                for model in accepted:
+                    error = _base_chain_error(candidate, model["name"])
+                    if error is not None:
+                        failed[model["name"]] = error
+                if not failed:
+                    break
+                for model in accepted:
+                    if model["name"] in failed:
+                        report["errors"].append((staged[model["name"]][0], failed[model["name"]]))
+                accepted = [model for model in accepted if model["name"] not in failed]
+            if on_conflict == "error" and (report["skipped"] or report["errors"]):
+                raise ValueError("Импорт отменен:\n" + format_import_report(report))
+            if accepted:
+                for model in accepted:
+                    if model["name"] in raw:
+                        report["replaced"] += 1
+                    else:
+                        report["added"] += 1
+                    raw[model["name"]] = model
+                # Основы могут прийти в той же пачке, поэтому связываем профили после вставки всех.
+                self._models = link_profiles(raw)
+                if not self.active:
+                    self.active = accepted[0]["name"]
+                self._seq += 1
+                self._save()
+        return report
+
+    def _validate_import_record(self, record) -> dict:
+        if not isinstance(record, dict):
+            raise ValueError("запись должна быть объектом")
+        model = {}
+        for key, value in record.items():
+            if isinstance(value, bool):
+                value = "1" if value else "0"
+            elif isinstance(value, (int, float)):
+                value = str(value)
+            elif value is None:
+                continue
+            elif not isinstance(value, str):
+                raise ValueError(f"поле {key}: ожидается строка")
+            model[str(key)] = value
+        model["name"] = model.get("name", "").strip()
+        model["endpoint"] = model.get("endpoint", "").strip()
+        if not model["name"] or not (model["endpoint"] or model.get("base")):
+            raise ValueError("обязательны name и endpoint (или base)")
+        _check_profile_name(model["name"])
+        if model.get("base") == model["name"]:
+            raise ValueError("профиль не может быть основой сам для себя")
+        if not model["endpoint"]:
+            del model["endpoint"]
+        return model
+
+    def clone_model(self, name: str) -> dict:
+        with self._transaction():
+            source_model = self._models.get(name)
+            if not source_model:
+                raise ValueError("Модель не найдена")
+            # Копия ссылается на ту же основу и хранит те же отличия, а не полный набор значений.
+            clone = Profile({**source_model.overrides, "name": self._make_copy_name(name)}, source_model.base)
+            self._models[clone.name] = clone
+            self._commit({"op": "add", "model": clone.overrides})
+            return clone
+
+    def remove_model(self, name: str):
+        with self._transaction():
+            removed = self._models.pop(name, None)
+            if self.active == name:
+                self.active = next(iter(self._models), None)
+            dependents = [m for m in self._models.values() if m.base_name == name]
+            if removed is None or not dependents:
+                self._commit({"op": "remove", "name": name})
+                return
+            # Профили, наследовавшие от удаленного, получают его значения как собственные.
+            for model in dependents:
+                values = dict(model.items())
+                values["base"] = removed.base_name
+                self._models[model.name] = Profile.from_values(values, removed.base)
+            self._relink_dependents({model.name for model in dependents})
+            self._seq += 1
+            self._save()
+
+    def set_active(self, name: str, *, expect_active=_MISSING) -> Path | None:
+        """Делает профиль активным. С expect_active переключает, только если активен
+        все еще этот профиль (с учетом чужих изменений); иначе возвращает None."""
+        # settings.json пишется под той же блокировкой: иначе при параллельных переключениях
+        # в нем мог бы остаться профиль, который уже не активен в хранилище.
+        with self._transaction():
+            model = self._models.get(name)
+            if not model:
+                raise ValueError("Модель не найдена")
+            if expect_active is not _MISSING and self.active != expect_active:
+                return None
+            self.active = name
+            self._commit({"op": "active"})
+            return self._write_claude_settings(model)
+
+    def activate_browserless(self, name: str) -> Path:
+        with self._transaction():
+            model = self._models.get(name)
+            if not model:
+                raise ValueError("Модель не найдена")
+            if not str(model.get("api_key", "")).strip():
+                raise ValueError(
+                    "Для режима без браузера нужен API ключ. "
+                    "Добавь ключ в модель и попробуй снова."
+                )
+            self.active = name
+            self._commit({"op": "active"})
+            return self._write_claude_settings(model, force_console_login=True, force_api_key_auth=True)
+
+    def is_active(self, name: str) -> bool:
+        with self.lock:
+            return self.active == name
+
+    def update_model(self, old_name: str, new_model: dict):
+        with self._transaction():
+            new_model = self._normalize_model(new_model, old_name)
+            if old_name not in self._models:
+                raise ValueError("Модель не найдена")
+            # ensure unique names
+            if new_model["name"] != old_name and new_model["name"] in self._models:
+                raise ValueError(f"Модель {new_model['name']} уже существует")
+            self._models = self._replace_in_index(self._models, old_name, new_model)
+            if self.active == old_name:
+                self.active = new_model["name"]
+            renamed = new_model["name"] != old_name
+            dependents = [m for m in self._models.values() if m.base_name == old_name]
+            if renamed and dependents:
+                # Переименование основы меняет ссылки в других профилях: пишем целым снимком.
+                for model in dependents:
+                    self._models[model.name] = Profile({**model.overrides, "base": new_model.name}, new_model)
+                self._relink_dependents({model.name for model in dependents})
+                self._seq += 1
+                self._save()
+            else:
+                self._relink_dependents({old_name})
+                self._commit({"op": "update", "name": old_name, "model": new_model.overrides})
+        self._write_claude_settings(new_model)
+
+    def _normalize_model(self, model: Mapping, old_name: str | None = None) -> Profile:
+        """Профиль из полного набора значений (диалог, CLI); проверяет ссылку на основу.
+
+        old_name — прежнее имя редактируемого профиля: при переименовании цепочка
+        основ не должна вести ни к новому, ни к старому имени.
+        """
+        _check_profile_name(str(model.get("name", "")))
+        base_name = model.get("base") or None
+        base = None
+        if base_name is not None:
+            base = self._models.get(base_name)
+            if base is None:
+                raise ValueError(f"Базовый профиль {base_name} не найден")
+            own_names = {model.get("name"), old_name} - {None}
+            ancestor = base
+            while ancestor is not None:
+                if ancestor.name in own_names:
+                    raise ValueError("Цепочка основ профиля не может замыкаться на сам профиль")
+                ancestor = ancestor.base
+        return Profile.from_values(model, base)
+
+    def _relink_dependents(self, names: set) -> None:
+        """Пересобирает связи, если среди names есть чья-то основа: наследники видят новую запись."""
+        if any(m.base_name in names for m in self._models.values()):
+            self._models = link_profiles(self._models, compact=False)
+
+    def _make_copy_name(self, source_name: str) -> str:
+        base_name = f"{source_name} копия"
+        if base_name not in self._models:
+            return base_name
+        index = 2
+        while True:
+            candidate = f"{base_name} {index}"
+            if candidate not in self._models:
+                return candidate
+            index += 1
+
+    def _write_claude_settings(
+        self,
+        model: dict,
+        *,
+        force_console_login: bool = False,
+        force_api_key_auth: bool = False,
+    ) -> Path:
+        gateway = read_gateway_config()
+        if gateway.get("enabled") and gateway.get("token") and gateway_running():
+            # claude всегда ходит в локальный шлюз; профиль он подставляет сам на каждый запрос,
+            # поэтому при переключении settings.json не меняется и перезапуск не нужен.
+            # Без живого шлюза пишем endpoint профиля: мертвый порт сломал бы claude.
+            model = {
+                **model,
+                "endpoint": gateway_base_url(gateway),
+                "api_key": str(gateway["token"]),
+                "HTTP_PROXY": "",
+                **GATEWAY_MODEL_ALIASES,
+            }
+
+        def build_env(env: dict) -> dict:
+            return profile_env(model, env, force_api_key_auth=force_api_key_auth)
+
+        extra = {"forceLoginMethod": "console"} if force_console_login else {}
+        settings_writer.apply(CLAUDE_SETTINGS_PATH, build_env, extra)
+        return CLAUDE_SETTINGS_PATH
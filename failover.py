@@ -0,0 +1,238 @@
+"""Автоматическое переключение профиля при деградации endpoint-а.
+
+Фоновый роутер периодически проверяет профили из группы отказоустойчивости,
+ведет для каждого EWMA задержки и доли ошибок и, если активный профиль
+стабильно хуже порога, делает активным самый здоровый профиль группы через
+ModelManager.set_active. От «дребезга» защищают три условия: несколько
+плохих раундов подряд, запас по качеству у кандидата и минимальное время
+между переключениями. Каждое переключение дописывается в журнал.
+
+Настройки лежат в ~/.config/ccc_hub/failover.json, например:
+
+    {"enabled": true, "group": ["Z.AI Claude Proxy", "Backup"], "interval_seconds": 30}
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from core import DATA_PATH
+
+FAILOVER_CONFIG_PATH = DATA_PATH.parent / "failover.json"
+FAILOVER_LOG_PATH = DATA_PATH.parent / "failover.log"
+# Ошибка весит как столько миллисекунд задержки при сравнении профилей.
+ERROR_PENALTY_MS = 5000.0
+# 429 и 5xx означают, что шлюз отвечает, но пользоваться им сейчас нельзя.
+_FAILURE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class FailoverConfig:
+    __slots__ = (
+        "enabled",
+        "group",
+        "interval_seconds",
+        "alpha",
+        "latency_threshold_ms",
+        "error_threshold",
+        "unhealthy_rounds",
+        "margin",
+        "min_dwell_seconds",
+    )
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        group: list[str] | None = None,
+        interval_seconds: float = 30.0,
+        alpha: float = 0.3,
+        latency_threshold_ms: float = 1500.0,
+        error_threshold: float = 0.5,
+        unhealthy_rounds: int = 2,
+        margin: float = 0.2,
+        min_dwell_seconds: float = 120.0,
+    ):
+        self.enabled = enabled
+        self.group = list(group or [])
+        self.interval_seconds = interval_seconds
+        self.alpha = alpha
+        self.latency_threshold_ms = latency_threshold_ms
+        self.error_threshold = error_threshold
+        self.unhealthy_rounds = unhealthy_rounds
+        self.margin = margin
+        self.min_dwell_seconds = min_dwell_seconds
+
+    @classmethod
+    def load(cls, path: Path = FAILOVER_CONFIG_PATH) -> "FailoverConfig":
+        """Читает настройки; отсутствующий или битый файл означает «выключено»."""
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls()
+        if not isinstance(data, dict):
+            return cls()
+        config = cls()
+        for field in cls.__slots__:
+            if field not in data:
+                continue
+            default = getattr(config, field)
+            value = data[field]
+            if field == "group":
+                if isinstance(value, list):
+                    config.group = [str(name) for name in value]
+            elif isinstance(default, bool):
+                setattr(config, field, bool(value))
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                setattr(config, field, type(default)(value))
+        return config
+
+
+class HealthScore:
+    """EWMA задержки и доли ошибок одного профиля. Меньший score — лучше."""
+
+    __slots__ = ("latency_ms", "error_rate", "samples", "bad_rounds")
+
+    def __init__(self):
+        self.latency_ms: float | None = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.bad_rounds = 0
+
+    def observe(self, latency_ms: float | None, failed: bool, alpha: float) -> None:
+        self.samples += 1
+        self.error_rate += alpha * ((1.0 if failed else 0.0) - self.error_rate)
+        if not failed and latency_ms is not None:
+            if self.latency_ms is None:
+                self.latency_ms = latency_ms
+            else:
+                self.latency_ms += alpha * (latency_ms - self.latency_ms)
+
+    def score(self, config: FailoverConfig) -> float:
+        latency = self.latency_ms if self.latency_ms is not None else config.latency_threshold_ms
+        return latency + self.error_rate * ERROR_PENALTY_MS
+
+    def is_healthy(self, config: FailoverConfig) -> bool:
+        if self.samples == 0 or self.error_rate >= config.error_threshold:
+            return False
+        return self.latency_ms is not None and self.latency_ms < config.latency_threshold_ms
+
+
+class FailoverRouter:
+    def __init__(
+        self,
+        manager,
+        engine,
+        config: FailoverConfig,
+        *,
+        log_path: Path = FAILOVER_LOG_PATH,
+        on_switch=None,
+    ):
+        self.manager = manager
+        self.engine = engine
+        self.config = config
+        self.log_path = log_path
+        self.on_switch = on_switch
+        self.lock = threading.Lock()
+        self.scores: dict[str, HealthScore] = {}
+        self._last_switch = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def observe(self, results) -> None:
+        with self.lock:
+            for result in results:
+                score = self.scores.setdefault(result.name, HealthScore())
+                failed = not result.ok or result.status in _FAILURE_STATUSES
+                score.observe(result.total_ms, failed, self.config.alpha)
+                score.bad_rounds = 0 if score.is_healthy(self.config) else score.bad_rounds + 1
+
+    def choose_target(self, now: float | None = None, active: str | None = None) -> tuple[str, str] | None:
+        """Возвращает (имя профиля, причина), если активный профиль пора сменить.
+
+        active — активный профиль из того же снимка, по которому шел раунд проверки.
+        """
+        config = self.config
+        now = time.monotonic() if now is None else now
+        if active is None:
+            active = self.manager.snapshot()[1]
+        if active not in config.group:
+            return None
+        if self._last_switch and now - self._last_switch < config.min_dwell_seconds:
+            return None
+        with self.lock:
+            current = self.scores.get(active)
+            if current is None or current.bad_rounds < config.unhealthy_rounds:
+                return None
+            current_score = current.score(config)
+            candidates = [
+                (score.score(config), name)
+                for name, score in self.scores.items()
+                if name != active and name in config.group and score.is_healthy(config)
+            ]
+        if not candidates:
+            return None
+        best_score, best_name = min(candidates)
+        if best_score * (1 + config.margin) >= current_score:
+            return None
+        reason = (
+            f"{active}: {_format_score(current)} хуже порога {current.bad_rounds} раунда(ов); "
+            f"{best_name}: {best_score:.0f}"
+        )
+        return best_name, reason
+
+    def step(self) -> str | None:
+        """Один раунд: проверка группы, обновление оценок, при необходимости переключение."""
+        # Профиль могли переключить из GUI или другого терминала: решаем по свежему состоянию.
+        self.manager.reload_if_changed()
+        profiles, previous = self.manager.snapshot()
+        present = {m["name"]: m for m in profiles}
+        models = [present[name] for name in self.config.group if name in present]
+        if len(models) < 2:
+            return None
+        self.observe(self.engine.probe_all(models))
+        decision = self.choose_target(active=previous)
+        if decision is None:
+            return None
+        target, reason = decision
+        # Пока шла проверка, пользователь мог выбрать профиль вручную — его выбор не перебиваем.
+        if self.manager.set_active(target, expect_active=previous) is None:
+            self._log(f"{previous} -> {target} отменено: активный профиль сменился во время проверки")
+            return None
+        self._last_switch = time.monotonic()
+        with self.lock:
+            for score in self.scores.values():
+                score.bad_rounds = 0
+        self._log(f"{previous} -> {target}: {reason}")
+        if self.on_switch is not None:
+            self.on_switch(previous, target, reason)
+        return target
+
+    def _log(self, message: str) -> None:
+        line = f"{time.strftime('%Y-%m-%d %H:%M:%S')} {message}\n"
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.log_path.open("a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError:
+            pass
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="failover", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.step()
+            except Exception as exc:
+                # Сбой раунда (например, set_active не смог записать файл) не останавливает роутер.
+                self._log(f"ошибка раунда: {exc}")
+            self._stop.wait(self.config.interval_seconds)
+
+
+def _format_score(score: HealthScore) -> str:
+    latency = f"{score.latency_ms:.0f} мс" if score.latency_ms is not None else "нет ответа"
+    return f"{latency}, ошибок {score.error_rate:.0%}"
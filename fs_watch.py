@@ -0,0 +1,145 @@
+"""Наблюдение за файлами: inotify на Linux, опрос mtime в остальных случаях.
+
+Следим за каталогами, а не за самими файлами: атомарная запись через rename
+заменяет inode, и watch на файле перестал бы срабатывать.
+"""
+
+import os
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+
+from storage import file_signature
+
+POLL_INTERVAL = 2.0
+DEBOUNCE_SECONDS = 0.1
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_DELETE = 0x00000200
+_IN_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FileWatcher:
+    """Вызывает callback(set[Path]) из фонового потока, когда файлы меняются на диске."""
+
+    def __init__(self, paths: list[Path], callback, poll_interval: float = POLL_INTERVAL):
+        self.paths = [Path(p) for p in paths]
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._inotify_fd = None
+        self._stop_pipe = None
+        self.backend = "poll"
+
+    def start(self) -> None:
+        libc = _load_libc()
+        if libc is not None and self._init_inotify(libc):
+            self.backend = "inotify"
+            target = self._run_inotify
+        else:
+            target = self._run_polling
+        self._thread = threading.Thread(target=target, name="fs-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._stop_pipe is not None:
+            try:
+                os.write(self._stop_pipe[1], b"\0")
+            except OSError:
+                pass
+
+    def _init_inotify(self, libc) -> bool:
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return False
+        directories = {p.parent for p in self.paths}
+        for directory in directories:
+            try:
+                directory.mkdir(parents=True, exist_ok=True)
+            except OSError:
+                os.close(fd)
+                return False
+            if libc.inotify_add_watch(fd, os.fsencode(directory), _IN_WATCH_MASK) < 0:
+                os.close(fd)
+                return False
+        self._inotify_fd = fd
+        self._stop_pipe = os.pipe()
+        return True
+
+    def _read_inotify_names(self) -> set[str]:
+        names = set()
+        try:
+            data = os.read(self._inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + name_len].rstrip(b"\0")
+            offset += name_len
+            if name:
+                names.add(os.fsdecode(name))
+        return names
+
+    def _run_inotify(self) -> None:
+        watched = {p.name: p for p in self.paths}
+        readers = [self._inotify_fd, self._stop_pipe[0]]
+        try:
+            while not self._stop.is_set():
+                # Без таймаута: поток спит, пока ядро не сообщит о событии или не придет stop().
+                ready, _, _ = select.select(readers, [], [])
+                if self._stop_pipe[0] in ready:
+                    break
+                names = self._read_inotify_names()
+                # Склеиваем всплеск событий (tmp + rename, несколько append-ов) в один вызов.
+                while select.select([self._inotify_fd], [], [], DEBOUNCE_SECONDS)[0]:
+                    names |= self._read_inotify_names()
+                changed = {watched[name] for name in names if name in watched}
+                if changed:
+                    self._notify(changed)
+        finally:
+            os.close(self._inotify_fd)
+            os.close(self._stop_pipe[0])
+            os.close(self._stop_pipe[1])
+
+    def _run_polling(self) -> None:
+        signatures = {p: file_signature(p) for p in self.paths}
+        while not self._stop.wait(self.poll_interval):
+            changed = set()
+            for path in self.paths:
+                signature = file_signature(path)
+                if signature != signatures[path]:
+                    signatures[path] = signature
+                    changed.add(path)
+            if changed:
+                self._notify(changed)
+
+    def _notify(self, changed: set[Path]) -> None:
+        try:
+            self.callback(changed)
+        except Exception:
+            # Ошибка обработчика не должна останавливать наблюдение.
+            pass
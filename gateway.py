@@ -0,0 +1,295 @@
+"""Локальный Anthropic-совместимый шлюз для переключения моделей без перезапуска claude.
+
+В режиме шлюза ANTHROPIC_BASE_URL в settings.json один раз указывает на
+http://127.0.0.1:<port>, а ключом служит случайный токен шлюза. Каждый запрос
+шлюз пересылает в endpoint активного на этот момент профиля: подставляет его
+API ключ, заменяет псевдонимы ccc-haiku/ccc-sonnet/ccc-opus моделями профиля
+и ходит через его HTTP_PROXY. Соединения к upstream берутся из keep-alive пула,
+а ответ (в том числе SSE) отдается клиенту по мере получения, без буферизации.
+
+Запросы без токена шлюза отклоняются: иначе любой локальный процесс мог бы
+пользоваться ключами профилей.
+
+Пока шлюз работает, он держит блокировку gateway.lock. Только при живой
+блокировке settings.json направляется на шлюз; после остановки (или падения
+процесса) активация снова пишет endpoint профиля напрямую.
+"""
+
+import hmac
+import json
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core import (
+    GATEWAY_CONFIG_PATH,
+    GATEWAY_DEFAULT_PORT,
+    GATEWAY_LOCK_PATH,
+    GATEWAY_MODEL_ALIASES,
+    ModelManager,
+    read_gateway_config,
+)
+from http_client import HttpClient
+from storage import FileLock, atomic_write_text
+
+# Модель может думать минутами между событиями потока — таймаут чтения намного больше обычного.
+UPSTREAM_READ_TIMEOUT = 600.0
+STREAM_CHUNK_SIZE = 64 * 1024
+_HOP_BY_HOP = frozenset(
+    {
+        "connection",
+        "keep-alive",
+        "proxy-authenticate",
+        "proxy-authorization",
+        "te",
+        "trailers",
+        "transfer-encoding",
+        "upgrade",
+        "host",
+        "content-length",
+    }
+)
+_AUTH_HEADERS = frozenset({"x-api-key", "authorization"})
+# Эти заголовки шлюз выставляет сам в send_response.
+_OWN_RESPONSE_HEADERS = frozenset({"server", "date"})
+_FAMILIES = {env_key: alias.rpartition("-")[2] for env_key, alias in GATEWAY_MODEL_ALIASES.items()}
+
+
+def ensure_gateway_config(port: int | None = None) -> dict:
+    """Включает режим шлюза перед запуском: создает токен при первом включении и сохраняет файл.
+
+    Вызывается, только когда шлюз запускают намеренно, поэтому enabled всегда
+    становится True — в том числе после cli.py gateway --disable.
+    """
+    config = read_gateway_config()
+    changed = False
+    if not config.get("token"):
+        config["token"] = secrets.token_urlsafe(24)
+        changed = True
+    if port is not None and config.get("port") != port:
+        config["port"] = port
+        changed = True
+    if "port" not in config:
+        config["port"] = GATEWAY_DEFAULT_PORT
+        changed = True
+    if config.get("enabled") is not True:
+        config["enabled"] = True
+        changed = True
+    if changed:
+        _write_gateway_config(config)
+    return config
+
+
+def disable_gateway() -> None:
+    config = read_gateway_config()
+    if config.get("enabled"):
+        config["enabled"] = False
+        _write_gateway_config(config)
+
+
+def _write_gateway_config(config: dict) -> None:
+    # В файле лежит токен шлюза: права 0600 ставятся до записи, а не после rename.
+    atomic_write_text(GATEWAY_CONFIG_PATH, json.dumps(config, indent=2), mode=0o600)
+
+
+def upstream_url(endpoint: str, path: str) -> str:
+    """Склеивает endpoint профиля и путь запроса claude, не удваивая /v1."""
+    base = endpoint.rstrip("/")
+    if base.endswith("/v1") and (path == "/v1" or path.startswith("/v1/")):
+        base = base[: -len("/v1")]
+    return base + path
+
+
+def map_model(model_name: str, profile: dict) -> str:
+    """Псевдоним ccc-* или имя из семейства haiku/sonnet/opus -> модель из профиля."""
+    lowered = model_name.lower()
+    for env_key, alias in GATEWAY_MODEL_ALIASES.items():
+        if model_name == alias or _FAMILIES[env_key] in lowered:
+            target = str(profile.get(env_key, "")).strip()
+            if target:
+                return target
+    return model_name
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "ccc-hub-gateway"
+    # Заголовки и куски SSE пишутся отдельно; без TCP_NODELAY каждый мелкий ответ ждал бы ACK ~40 мс.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._forward()
+
+    def do_POST(self):
+        self._forward()
+
+    def do_PUT(self):
+        self._forward()
+
+    def do_DELETE(self):
+        self._forward()
+
+    def _send_error_json(self, status: int, error_type: str, message: str) -> None:
+        body = json.dumps({"type": "error", "error": {"type": error_type, "message": message}}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self) -> bool:
+        token = self.server.gateway.token
+        presented = self.headers.get("x-api-key", "")
+        if not presented:
+            authorization = self.headers.get("Authorization", "")
+            if authorization.lower().startswith("bearer "):
+                presented = authorization[7:].strip()
+        return hmac.compare_digest(presented.encode("utf-8"), token.encode("utf-8"))
+
+    def _forward(self) -> None:
+        gateway = self.server.gateway
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        if not self._authorized():
+            self._send_error_json(401, "authentication_error", "Неверный токен шлюза ccc-hub")
+            return
+        profile = gateway.current_profile()
+        if profile is None:
+            self._send_error_json(503, "api_error", "В ccc-hub нет активного профиля")
+            return
+
+        headers = {
+            key: value
+            for key, value in self.headers.items()
+            if key.lower() not in _HOP_BY_HOP and key.lower() not in _AUTH_HEADERS
+        }
+        api_key = str(profile.get("api_key", "")).strip()
+        if api_key:
+            headers["x-api-key"] = api_key
+            headers["Authorization"] = f"Bearer {api_key}"
+        if body and "json" in self.headers.get("Content-Type", ""):
+            body = self._rewrite_model(body, profile)
+
+        url = upstream_url(str(profile.get("endpoint", "")), self.path)
+        try:
+            response = gateway.client.request(
+                self.command,
+                url,
+                headers=headers,
+                body=body,
+                proxy=str(profile.get("HTTP_PROXY", "")),
+            )
+        except Exception as exc:
+            self._send_error_json(502, "api_error", f"Upstream {profile.get('name')}: {exc}")
+            return
+        with response:
+            self._relay(response)
+
+    @staticmethod
+    def _rewrite_model(body: bytes, profile: dict) -> bytes:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return body
+        if not isinstance(payload, dict) or not isinstance(payload.get("model"), str):
+            return body
+        mapped = map_model(payload["model"], profile)
+        if mapped == payload["model"]:
+            return body
+        payload["model"] = mapped
+        return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    def _relay(self, response) -> None:
+        self.send_response(response.status, response.reason)
+        for key, value in response.headers.items():
+            if key.lower() not in _HOP_BY_HOP and key.lower() not in _OWN_RESPONSE_HEADERS:
+                self.send_header(key, value)
+        content_length = response.headers.get("Content-Length")
+        chunked = content_length is None and self.command != "HEAD" and response.status not in (204, 304)
+        if content_length is not None:
+            self.send_header("Content-Length", content_length)
+        elif chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            while True:
+                data = response.read1(STREAM_CHUNK_SIZE)
+                if not data:
+                    break
+                if chunked:
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                else:
+                    self.wfile.write(data)
+                # Каждое событие SSE уходит клиенту сразу, а не копится в буфере.
+                self.wfile.flush()
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+        except OSError:
+            # Клиент отключился посреди потока: соединение с ним больше не годится.
+            self.close_connection = True
+
+
+class _GatewayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, gateway: "LocalGateway"):
+        self.gateway = gateway
+        super().__init__(address, _GatewayHandler)
+
+
+class LocalGateway:
+    """HTTP-сервер на 127.0.0.1, пересылающий запросы в активный профиль ModelManager."""
+
+    def __init__(self, manager: ModelManager, token: str, port: int = GATEWAY_DEFAULT_PORT, client=None):
+        self.manager = manager
+        self.token = token
+        self.port = port
+        self.client = client or HttpClient(read_timeout=UPSTREAM_READ_TIMEOUT)
+        self._server = None
+        self._thread = None
+        self._liveness = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def current_profile(self) -> dict | None:
+        # Профиль мог переключить другой процесс (cli.py switch): проверка по stat дешевая.
+        self.manager.reload_if_changed()
+        return self.manager.active_model()
+
+    def start(self) -> None:
+        liveness = FileLock(GATEWAY_LOCK_PATH)
+        if not liveness.try_acquire():
+            liveness.close()
+            raise OSError("шлюз уже запущен другим процессом")
+        try:
+            self._server = _GatewayServer(("127.0.0.1", self.port), self)
+        except OSError:
+            liveness.release()
+            liveness.close()
+            raise
+        self._liveness = liveness
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="gateway", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.client.close()
+        if self._liveness is not None:
+            self._liveness.release()
+            self._liveness.close()
+            self._liveness = None
+            # Шлюза больше нет: возвращаем claude на endpoint активного профиля.
+            active = self.current_profile()
+            if active is not None:
+                self.manager._write_claude_settings(active)
+
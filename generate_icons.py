@@ -1,10 +1,30 @@
 #!/usr/bin/env python3
-"""Конвертация исходной PNG-иконки в форматы для сборки приложения."""
+"""Конвертация исходной PNG-иконки в форматы для сборки приложения.
 
+Повторный запуск ничего не делает, если исходник и готовые файлы не менялись:
+хэши хранятся в assets/.icons_manifest.json. Форматы пишутся параллельно
+в пуле процессов, а промежуточные размеры переиспользуются при уменьшении.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
+import argparse
+import hashlib
+import json
 import os
 import sys
 
+# Увеличивается при изменении параметров генерации, чтобы манифест устарел.
+GENERATOR_VERSION = 1
+MANIFEST_NAME = ".icons_manifest.json"
+ICO_SIZES = [16, 32, 48, 64, 128, 256]
+# Имя файла -> (формат, сторона квадрата, с которой работает writer).
+OUTPUTS = {
+    "icon.png": ("png", 512),
+    "icon.ico": ("ico", max(ICO_SIZES)),
+    "icon.icns": ("icns", 1024),
+}
+
 
 def _load_source_icon(source_path: str) -> Image.Image:
     """Загружает исходную PNG-иконку."""
@@ -13,52 +33,140 @@ def _load_source_icon(source_path: str) -> Image.Image:
     return Image.open(source_path).convert("RGBA")
 
 
-def save_png_icon(source: Image.Image, output_path: str, size: int = 512) -> None:
+def _file_hash(path: str) -> str | None:
+    """sha256 содержимого файла или None, если файла нет."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _load_manifest(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _save_manifest(path: str, manifest: dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def _is_up_to_date(manifest: dict, source_hash: str, name: str, output_path: str) -> bool:
+    """Файл свежий, если манифест собран из того же исходника и файл не трогали после генерации."""
+    if manifest.get("version") != GENERATOR_VERSION or manifest.get("source") != source_hash:
+        return False
+    entry = manifest.get("outputs", {}).get(name)
+    return bool(entry) and entry.get("hash") == _file_hash(output_path)
+
+
+def scale_chain(source: Image.Image, sizes: list[int]) -> dict[int, Image.Image]:
+    """Масштабирует в нужные размеры от большего к меньшему.
+
+    Меньший размер берется из уже готового промежуточного, если тот был получен
+    уменьшением исходника и хотя бы вдвое больше цели — так LANCZOS не теряет
+    в качестве. Иначе (в том числе для увеличенных копий) — из исходника.
+    """
+    source_side = min(source.size)
+    results: dict[int, Image.Image] = {}
+    for size in sorted(set(sizes), reverse=True):
+        base = source
+        for have in sorted(results):
+            if 2 * size <= have <= source_side:
+                base = results[have]
+                break
+        results[size] = base.resize((size, size), Image.Resampling.LANCZOS)
+    return results
+
+
+def save_png_icon(icon: Image.Image, output_path: str) -> tuple[bool, str]:
     """Сохраняет PNG-иконку фиксированного размера."""
-    icon = source.resize((size, size), Image.Resampling.LANCZOS)
     icon.save(output_path, "PNG")
-    print(f"Generated: {output_path} ({size}x{size})")
+    return True, f"Generated: {output_path} ({icon.width}x{icon.height})"
 
 
-def save_ico_icon(source: Image.Image, output_path: str) -> None:
+def save_ico_icon(icon: Image.Image, output_path: str) -> tuple[bool, str]:
     """Сохраняет ICO-иконку (Windows) с множественными размерами."""
-    sizes = [16, 32, 48, 64, 128, 256]
-    base_size = max(sizes)
-    icon = source.resize((base_size, base_size), Image.Resampling.LANCZOS)
-
     icon.save(
         output_path,
         format="ICO",
-        sizes=[(s, s) for s in sizes],
+        sizes=[(s, s) for s in ICO_SIZES],
     )
-    print(f"Generated: {output_path} with sizes: {sizes}")
+    return True, f"Generated: {output_path} with sizes: {ICO_SIZES}"
 
 
-def save_icns_icon(source: Image.Image, output_path: str) -> None:
+def save_icns_icon(icon: Image.Image, output_path: str) -> tuple[bool, str]:
     """Пробует сохранить ICNS (если Pillow поддерживает текущую платформу)."""
     try:
-        icon = source.resize((1024, 1024), Image.Resampling.LANCZOS)
         icon.save(output_path, "ICNS")
-        print(f"Generated: {output_path}")
+        return True, f"Generated: {output_path}"
     except Exception as exc:
-        print(f"Skipped ICNS generation: {exc}")
+        return False, f"Skipped ICNS generation: {exc}"
+
+
+WRITERS = {
+    "png": save_png_icon,
+    "ico": save_ico_icon,
+    "icns": save_icns_icon,
+}
 
 
 def main():
     """Главная функция конвертации всех иконок."""
-    assets_dir = os.path.join(os.path.dirname(__file__), "assets")
+    parser = argparse.ArgumentParser(description="Generate icon.png/.ico/.icns from assets/ico.png")
+    parser.add_argument("--force", action="store_true", help="regenerate even if outputs are up to date")
+    args = parser.parse_args()
+
+    assets_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
     os.makedirs(assets_dir, exist_ok=True)
     source_path = os.path.join(assets_dir, "ico.png")
+    manifest_path = os.path.join(assets_dir, MANIFEST_NAME)
 
-    try:
-        source = _load_source_icon(source_path)
-    except FileNotFoundError as exc:
-        print(exc)
+    source_hash = _file_hash(source_path)
+    if source_hash is None:
+        print(f"Source icon not found: {source_path}")
         sys.exit(1)
 
-    save_png_icon(source, os.path.join(assets_dir, "icon.png"), size=512)
-    save_ico_icon(source, os.path.join(assets_dir, "icon.ico"))
-    save_icns_icon(source, os.path.join(assets_dir, "icon.icns"))
+    manifest = {} if args.force else _load_manifest(manifest_path)
+    stale = [
+        name
+        for name in OUTPUTS
+        if not _is_up_to_date(manifest, source_hash, name, os.path.join(assets_dir, name))
+    ]
+    if not stale:
+        print("All icons are up to date.")
+        return
+
+    source = _load_source_icon(source_path)
+    scaled = scale_chain(source, [OUTPUTS[name][1] for name in stale])
+    jobs = {
+        name: (WRITERS[OUTPUTS[name][0]], scaled[OUTPUTS[name][1]], os.path.join(assets_dir, name))
+        for name in stale
+    }
+    workers = min(len(jobs), os.cpu_count() or 1)
+    if workers == 1:
+        results = {name: writer(icon, path) for name, (writer, icon, path) in jobs.items()}
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {name: pool.submit(writer, icon, path) for name, (writer, icon, path) in jobs.items()}
+            results = {name: future.result() for name, future in futures.items()}
+
+    outputs = manifest.get("outputs", {}) if manifest.get("source") == source_hash else {}
+    for name in OUTPUTS:
+        if name not in results:
+            continue
+        ok, message = results[name]
+        print(message)
+        if ok:
+            outputs[name] = {"hash": _file_hash(os.path.join(assets_dir, name))}
+        else:
+            outputs.pop(name, None)
+    _save_manifest(manifest_path, {"version": GENERATOR_VERSION, "source": source_hash, "outputs": outputs})
 
     print("\nAll icons generated successfully!")
     print(f"Assets directory: {assets_dir}")
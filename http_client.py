@@ -0,0 +1,453 @@
+"""Общий HTTP-клиент хаба: keep-alive пул соединений, кэш DNS и TLS-сессий.
+
+Загрузка каталогов /v1/models идет через один клиент, поэтому повторное
+обращение к тому же хосту не платит за DNS, TCP и TLS. Проверка задержки
+берет «холодный» клиент (cold=True), чтобы каждая фаза замерялась честно.
+Прокси задается на каждый запрос — у каждого профиля свой HTTP_PROXY.
+
+Модуль импортирует http.client, а ssl подгружает при первом HTTPS-запросе;
+потребители импортируют его лениво, чтобы не замедлять запуск GUI и CLI.
+"""
+
+import base64
+import http.client
+import json
+import select
+import socket
+import threading
+import time
+from urllib import parse as urllib_parse
+
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 12.0
+MAX_IDLE_PER_HOST = 4
+IDLE_TIMEOUT = 60.0
+DNS_TTL = 60.0
+DNS_CACHE_SIZE = 128
+TLS_SESSION_CACHE_SIZE = 128
+# Недочитанный остаток тела меньше этого размера дочитывается, чтобы сохранить соединение.
+DRAIN_LIMIT = 64 * 1024
+# Только эти запросы можно безопасно повторить, если keep-alive соединение оказалось закрытым.
+_RETRYABLE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class HttpError(Exception):
+    """Сервер ответил статусом 4xx/5xx."""
+
+    def __init__(self, status: int, reason: str, url: str):
+        super().__init__(f"HTTP {status}: {reason}")
+        self.status = status
+        self.reason = reason
+        self.url = url
+
+
+def _ms_since(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+class DnsCache:
+    """Результаты getaddrinfo с коротким TTL; адрес забывается, если к нему не удалось подключиться."""
+
+    def __init__(self, ttl: float = DNS_TTL, max_entries: int = DNS_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._entries: dict[tuple, tuple[float, list]] = {}
+
+    def resolve(self, host: str, port: int) -> list:
+        key = (host, port)
+        now = time.monotonic()
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        with self.lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (now + self.ttl, infos)
+        return infos
+
+    def forget(self, host: str, port: int) -> None:
+        with self.lock:
+            self._entries.pop((host, port), None)
+
+
+class TlsSessionCache:
+    """Последняя TLS-сессия по хосту: новое соединение к нему делает сокращенный handshake."""
+
+    def __init__(self, max_entries: int = TLS_SESSION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._sessions: dict[tuple, object] = {}
+
+    def get(self, key: tuple):
+        with self.lock:
+            return self._sessions.get(key)
+
+    def store(self, key: tuple, session) -> None:
+        if session is None or self.max_entries <= 0:
+            return
+        with self.lock:
+            self._sessions.pop(key, None)
+            while len(self._sessions) >= self.max_entries:
+                self._sessions.pop(next(iter(self._sessions)))
+            self._sessions[key] = session
+
+
+def parse_proxy(proxy: str) -> tuple[str, int, dict] | None:
+    """Разбирает значение HTTP_PROXY профиля: (хост, порт, заголовки авторизации) или None."""
+    proxy = proxy.strip()
+    if not proxy:
+        return None
+    parsed = urllib_parse.urlparse(proxy if "://" in proxy else f"http://{proxy}")
+    if parsed.scheme != "http" or not parsed.hostname:
+        raise ValueError(f"Поддерживается только HTTP-прокси вида http://host:port, получено: {proxy}")
+    try:
+        port = parsed.port or 80
+    except ValueError as exc:
+        raise ValueError(f"Некорректный порт прокси: {proxy}") from exc
+    headers = {}
+    if parsed.username:
+        credentials = f"{urllib_parse.unquote(parsed.username)}:{urllib_parse.unquote(parsed.password or '')}"
+        headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+    return parsed.hostname, port, headers
+
+
+class _PooledHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection с разрешением имен через DnsCache и замером фаз подключения."""
+
+    def __init__(self, host: str, port: int, *, dns: DnsCache, connect_timeout: float, read_timeout: float):
+        super().__init__(host, port, timeout=connect_timeout)
+        self.dns = dns
+        self.read_timeout = read_timeout
+        self.timings: dict[str, float] = {}
+        self.last_used = 0.0
+        self._create_connection = self._open_socket
+
+    def _open_socket(self, address, timeout=None, source_address=None):
+        host, port = address
+        t0 = time.perf_counter()
+        infos = self.dns.resolve(host, port)
+        self.timings["dns_ms"] = _ms_since(t0)
+        t0 = time.perf_counter()
+        last_error = None
+        for family, socktype, proto, _, sockaddr in infos:
+            sock = socket.socket(family, socktype, proto)
+            try:
+                sock.settimeout(timeout)
+                if source_address:
+                    sock.bind(source_address)
+                sock.connect(sockaddr)
+            except OSError as exc:
+                sock.close()
+                last_error = exc
+                continue
+            self.timings["connect_ms"] = _ms_since(t0)
+            return sock
+        # Адреса из кэша могли устареть: при следующей попытке спросим DNS заново.
+        self.dns.forget(host, port)
+        raise last_error or OSError(f"Не удалось подключиться к {host}:{port}")
+
+    def connect(self):
+        super().connect()
+        self.sock.settimeout(self.read_timeout)
+
+    def set_read_timeout(self, timeout: float) -> None:
+        self.read_timeout = timeout
+        if self.sock is not None:
+            self.sock.settimeout(timeout)
+
+    def save_tls_session(self) -> None:
+        pass
+
+
+class _PooledHTTPSConnection(_PooledHTTPConnection):
+    default_port = 443
+
+    def __init__(self, host: str, port: int, *, context, sessions: TlsSessionCache, session_key: tuple, **kwargs):
+        super().__init__(host, port, **kwargs)
+        self._context = context
+        self._sessions = sessions
+        self._session_key = session_key
+
+    def connect(self):
+        # TCP до сервера или до прокси (вместе с CONNECT-туннелем), затем TLS до целевого хоста.
+        super().connect()
+        server_hostname = self._tunnel_host or self.host
+        t0 = time.perf_counter()
+        self.sock = self._context.wrap_socket(
+            self.sock,
+            server_hostname=server_hostname,
+            session=self._sessions.get(self._session_key),
+        )
+        self.timings["tls_ms"] = _ms_since(t0)
+        self.timings["tls_resumed"] = bool(self.sock.session_reused)
+
+    def save_tls_session(self) -> None:
+        # В TLS 1.3 билет сессии приходит уже после handshake, поэтому сохраняем его после ответа.
+        session = getattr(self.sock, "session", None)
+        self._sessions.store(self._session_key, session)
+
+
+class HttpResponse:
+    """Ответ сервера. Соединение возвращается в пул, когда тело дочитано или ответ закрыт."""
+
+    def __init__(self, client: "HttpClient", pool_key: tuple, conn: _PooledHTTPConnection, raw, url: str, reused: bool):
+        self._client = client
+        self._pool_key = pool_key
+        self._conn = conn
+        self._raw = raw
+        self.url = url
+        self.status = raw.status
+        self.reason = raw.reason
+        self.headers = raw.headers
+        self.reused = reused
+        self.timings = dict(conn.timings)
+
+    def read(self, amt: int | None = None) -> bytes:
+        data = self._raw.read(amt)
+        if self._raw.isclosed():
+            self._finish()
+        return data
+
+    def read1(self, amt: int = 64 * 1024) -> bytes:
+        """Отдает то, что уже пришло, не дожидаясь amt байт — для потоков SSE."""
+        data = self._raw.read1(amt)
+        if self._raw.isclosed():
+            self._finish()
+        return data
+
+    def json(self):
+        return json.loads(self.read().decode("utf-8"))
+
+    def raise_for_status(self) -> None:
+        if self.status >= 400:
+            self.close()
+            raise HttpError(self.status, self.reason, self.url)
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        length = self._raw.length
+        if not self._raw.isclosed() and length is not None and length <= DRAIN_LIMIT:
+            try:
+                self._raw.read()
+            except OSError:
+                pass
+        if not self._raw.isclosed():
+            # Недочитанное тело нельзя оставить в keep-alive соединении — закрываем его.
+            self._raw.close()
+            self._conn.close()
+            self._conn = None
+            return
+        self._finish()
+
+    def _finish(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        if self._raw.will_close:
+            conn.close()
+        else:
+            self._client._release(self._pool_key, conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class HttpClient:
+    """Пул keep-alive соединений по ключу (схема, хост, порт, прокси).
+
+    cold=True выключает пул и кэши DNS и TLS-сессий: каждый запрос проходит
+    все фазы подключения заново (так работает проверка задержки).
+    """
+
+    def __init__(
+        self,
+        *,
+        connect_timeout: float = CONNECT_TIMEOUT,
+        read_timeout: float = READ_TIMEOUT,
+        max_idle_per_host: int = MAX_IDLE_PER_HOST,
+        idle_timeout: float = IDLE_TIMEOUT,
+        dns_ttl: float = DNS_TTL,
+        ssl_context=None,
+        cold: bool = False,
+    ):
+        if cold:
+            max_idle_per_host = 0
+            dns_ttl = 0.0
+        self.cold = cold
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self.dns = DnsCache(ttl=dns_ttl)
+        self.tls_sessions = TlsSessionCache(max_entries=0 if cold else TLS_SESSION_CACHE_SIZE)
+        self.lock = threading.Lock()
+        self._idle: dict[tuple, list[_PooledHTTPConnection]] = {}
+        self._ssl_context = ssl_context
+
+    def _get_ssl_context(self):
+        # Импорт ssl и загрузка системных сертификатов — только при первом HTTPS-запросе.
+        with self.lock:
+            if self._ssl_context is None:
+                import ssl
+
+                self._ssl_context = ssl.create_default_context()
+            return self._ssl_context
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: dict | None = None,
+        body: bytes | None = None,
+        proxy: str = "",
+        timeout: float | None = None,
+    ) -> HttpResponse:
+        """Отправляет запрос; timeout переопределяет таймаут чтения клиента для этого запроса."""
+        parsed = urllib_parse.urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError(f"Некорректный URL: {url}")
+        is_https = parsed.scheme == "https"
+        host = parsed.hostname
+        try:
+            port = parsed.port or (443 if is_https else 80)
+        except ValueError as exc:
+            raise ValueError(f"Некорректный порт в URL: {url}") from exc
+        proxy_info = parse_proxy(proxy)
+        pool_key = (parsed.scheme, host, port, proxy.strip())
+
+        target = parsed.path or "/"
+        if parsed.query:
+            target = f"{target}?{parsed.query}"
+        send_headers = dict(headers or {})
+        if proxy_info is not None and not is_https:
+            # Обычный HTTP через прокси: абсолютный URL в строке запроса, без туннеля.
+            target = urllib_parse.urlunparse(parsed._replace(fragment=""))
+            send_headers.update(proxy_info[2])
+
+        read_timeout = self.read_timeout if timeout is None else timeout
+        method = method.upper()
+        for attempt in range(2):
+            conn, reused = self._acquire(pool_key, is_https, host, port, proxy_info, read_timeout)
+            conn.timings = {}
+            t0 = time.perf_counter()
+            try:
+                conn.request(method, target, body=body, headers=send_headers)
+                raw = conn.getresponse()
+            except (ConnectionError, http.client.BadStatusLine):
+                conn.close()
+                # Сервер мог закрыть простаивавшее соединение — повторяем один раз на новом.
+                if reused and attempt == 0 and method in _RETRYABLE_METHODS:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            conn.timings["response_ms"] = _ms_since(t0)
+            return HttpResponse(self, pool_key, conn, raw, url, reused)
+        raise AssertionError("unreachable")
+
+    def get(self, url: str, **kwargs) -> HttpResponse:
+        return self.request("GET", url, **kwargs)
+
+    def _acquire(self, pool_key: tuple, is_https: bool, host: str, port: int, proxy_info, read_timeout: float):
+        now = time.monotonic()
+        while True:
+            with self.lock:
+                idle = self._idle.get(pool_key)
+                conn = idle.pop() if idle else None
+            if conn is None:
+                break
+            if now - conn.last_used > self.idle_timeout or not self._is_alive(conn):
+                conn.close()
+                continue
+            conn.set_read_timeout(read_timeout)
+            return conn, True
+
+        connect_host, connect_port = (proxy_info[0], proxy_info[1]) if proxy_info else (host, port)
+        options = {
+            "dns": self.dns,
+            "connect_timeout": min(self.connect_timeout, read_timeout),
+            "read_timeout": read_timeout,
+        }
+        if is_https:
+            conn = _PooledHTTPSConnection(
+                connect_host,
+                connect_port,
+                context=self._get_ssl_context(),
+                sessions=self.tls_sessions,
+                session_key=(host, port),
+                **options,
+            )
+            if proxy_info is not None:
+                conn.set_tunnel(host, port, headers=proxy_info[2])
+        else:
+            conn = _PooledHTTPConnection(connect_host, connect_port, **options)
+        return conn, False
+
+    @staticmethod
+    def _is_alive(conn: _PooledHTTPConnection) -> bool:
+        # Простаивающий сокет не должен быть читаемым: иначе сервер прислал FIN или мусор.
+        if conn.sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def _release(self, pool_key: tuple, conn: _PooledHTTPConnection) -> None:
+        if conn.sock is None:
+            return
+        conn.save_tls_session()
+        conn.last_used = time.monotonic()
+        with self.lock:
+            idle = self._idle.setdefault(pool_key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def idle_count(self) -> int:
+        with self.lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def close(self) -> None:
+        with self.lock:
+            pools, self._idle = self._idle, {}
+        for idle in pools.values():
+            for conn in idle:
+                conn.close()
+
+
+_shared_client: HttpClient | None = None
+_shared_client_lock = threading.Lock()
+
+
+def shared_client() -> HttpClient:
+    """Клиент на весь процесс: загрузки каталогов делят одни соединения."""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient()
+        return _shared_client
+
+
+_probe_client: HttpClient | None = None
+
+
+def probe_client() -> HttpClient:
+    """Клиент для проверки задержки: без пула и кэшей, но с одним SSL-контекстом на процесс."""
+    global _probe_client
+    with _shared_client_lock:
+        if _probe_client is None:
+            _probe_client = HttpClient(cold=True)
+        return _probe_client
@@ -0,0 +1,113 @@
+"""Дисковый кэш заранее отмасштабированных иконок для трея и окна.
+
+Файлы кэша называются по хэшу содержимого исходной PNG, поэтому замена
+assets/ico.png автоматически приводит к перерисовке. При попадании в кэш
+остается только прочитать маленький PNG — без декодирования исходника и LANCZOS.
+PIL импортируется лениво: модуль можно импортировать и без Pillow.
+"""
+
+import hashlib
+from pathlib import Path
+
+# Увеличивается при изменении отрисовки, чтобы старые файлы кэша не использовались.
+RENDER_VERSION = 1
+TRAY_ICON_SIZE = 64
+# Для iconphoto: обычный и HiDPI варианты иконки окна.
+WINDOW_ICON_SIZES = (32, 64, 128)
+VARIANTS = ("base", "active", "unreachable")
+_BADGE_COLORS = {
+    "active": (52, 199, 89, 255),
+    "unreachable": (255, 69, 58, 255),
+}
+
+
+class IconCache:
+    def __init__(self, cache_dir: Path, source_path: Path | None):
+        self.cache_dir = cache_dir
+        self.source_path = source_path
+        self._source_hash: str | None = None
+
+    @property
+    def source_hash(self) -> str | None:
+        if self._source_hash is None and self.source_path is not None:
+            try:
+                digest = hashlib.sha256(self.source_path.read_bytes()).hexdigest()[:16]
+            except OSError:
+                return None
+            self._source_hash = f"{digest}-v{RENDER_VERSION}"
+        return self._source_hash
+
+    def path_for(self, size: int, variant: str = "base") -> Path | None:
+        source_hash = self.source_hash
+        if source_hash is None:
+            return None
+        return self.cache_dir / f"{source_hash}-{variant}-{size}.png"
+
+    def cached_path(self, size: int, variant: str = "base") -> Path | None:
+        path = self.path_for(size, variant)
+        return path if path is not None and path.exists() else None
+
+    def _required(self) -> list[tuple[int, str]]:
+        sizes = sorted({TRAY_ICON_SIZE, *WINDOW_ICON_SIZES})
+        return [(size, "base") for size in sizes] + [
+            (TRAY_ICON_SIZE, variant) for variant in VARIANTS if variant != "base"
+        ]
+
+    def ensure(self) -> bool:
+        """Дорисовывает недостающие размеры и бейджи. Возвращает False, если исходника или PIL нет."""
+        source_hash = self.source_hash
+        if source_hash is None:
+            return False
+        missing = [(size, variant) for size, variant in self._required() if self.cached_path(size, variant) is None]
+        if not missing:
+            return True
+        try:
+            from PIL import Image
+        except Exception:
+            return False
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        source = Image.open(self.source_path).convert("RGBA")
+        scaled: dict[int, object] = {}
+        for size, variant in missing:
+            if size not in scaled:
+                scaled[size] = source.resize((size, size), Image.Resampling.LANCZOS)
+            image = scaled[size] if variant == "base" else self._draw_badge(scaled[size], _BADGE_COLORS[variant])
+            target = self.path_for(size, variant)
+            tmp_path = target.with_name(f"{target.name}.tmp")
+            image.save(tmp_path, "PNG")
+            tmp_path.replace(target)
+        self._remove_stale(source_hash)
+        return True
+
+    @staticmethod
+    def _draw_badge(image, color: tuple):
+        from PIL import ImageDraw
+
+        badged = image.copy()
+        size = badged.width
+        radius = max(3, size // 6)
+        center = size - radius - max(1, size // 32)
+        draw = ImageDraw.Draw(badged)
+        draw.ellipse(
+            (center - radius, center - radius, center + radius, center + radius),
+            fill=color,
+            outline=(255, 255, 255, 255),
+            width=max(1, size // 32),
+        )
+        return badged
+
+    def _remove_stale(self, source_hash: str) -> None:
+        for path in self.cache_dir.glob("*.png"):
+            if not path.name.startswith(f"{source_hash}-"):
+                path.unlink(missing_ok=True)
+
+    def load(self, size: int, variant: str = "base"):
+        """Открывает готовую PIL-картинку из кэша (ensure() должен быть вызван раньше)."""
+        from PIL import Image
+
+        path = self.cached_path(size, variant)
+        if path is None:
+            return None
+        with Image.open(path) as image:
+            return image.convert("RGBA")
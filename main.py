@@ -1,4 +1,6 @@
-import json
+# Импортируется первым: отсчет фаз запуска начинается с этой строки.
+from startup_trace import tracer
+
 import os
 import sys
 import threading
@@ -6,55 +8,31 @@ from pathlib import Path
 from tkinter import messagebox
 from tkinter import ttk
 import tkinter as tk
-from urllib import error as urllib_error
 from urllib import parse as urllib_parse
-from urllib import request as urllib_request
-
-DATA_PATH = Path.home() / ".config" / "ccc_hub" / "models.json"
-CLAUDE_SETTINGS_PATH = Path.home() / ".claude" / "settings.json"
-DEFAULT_ENV = {
-    "CLAUDE_CODE_ENABLE_TELEMETRY": "0",
-    "CLAUDE_CODE_DISABLE_NONESSENTIAL_TRAFFIC": "1",
-    "HTTP_PROXY": "",
-    "ANTHROPIC_API_KEY": "",
-    "ANTHROPIC_AUTH_TOKEN": "",
-    "ANTHROPIC_BASE_URL": "",
-    "ANTHROPIC_DEFAULT_HAIKU_MODEL": "glm-4.5-air",
-    "ANTHROPIC_DEFAULT_SONNET_MODEL": "glm-4.7",
-    "ANTHROPIC_DEFAULT_OPUS_MODEL": "glm-4.7",
-}
-DEFAULT_MODELS = [
-    {
-        "name": "Z.AI Claude Proxy",
-        "endpoint": "https://api.z.ai/api/anthropic",
-        "api_key": "your_zai_api_key",
-        **DEFAULT_ENV,
-    },
-    {
-        "name": "Local (Ollama)",
-        "endpoint": "http://localhost:11434/v1",
-        "api_key": "",
-        **{**DEFAULT_ENV, "ANTHROPIC_BASE_URL": "http://localhost:11434/v1"},
-    },
-]
-
-
-def _read_claude_env() -> dict:
-    if not CLAUDE_SETTINGS_PATH.exists():
-        return {}
-    try:
-        data = json.loads(CLAUDE_SETTINGS_PATH.read_text(encoding="utf-8"))
-    except Exception:
-        return {}
-    env = data.get("env", {})
-    return env if isinstance(env, dict) else {}
-
-
-def _has_claude_auth_token() -> bool:
-    env = _read_claude_env()
-    auth_token = env.get("ANTHROPIC_AUTH_TOKEN", "")
-    api_key = env.get("ANTHROPIC_API_KEY", "")
-    return bool(str(auth_token).strip() or str(api_key).strip())
+
+from catalog_cache import CatalogCache
+from catalog_index import CatalogIndex
+from core import (
+    CATALOG_CACHE_PATH,
+    CATALOG_INDEX_PATH,
+    CLAUDE_SETTINGS_PATH,
+    DATA_PATH,
+    DEFAULT_ENV,
+    ModelManager,
+    _has_claude_auth_token,
+    _read_claude_env,
+)
+from fs_watch import FileWatcher
+from icon_cache import TRAY_ICON_SIZE, VARIANTS, WINDOW_ICON_SIZES, IconCache
+from metrics import metrics, textfile_path
+from probe import ProbeEngine, build_models_url
+
+# Начиная с этого числа строк таблица рисует только видимое окно.
+TREE_VIRTUALIZE_THRESHOLD = 200
+# Начиная с этого числа профилей меню трея группируется по хосту endpoint-а.
+TRAY_GROUP_THRESHOLD = 15
+ICON_CACHE_DIR = DATA_PATH.parent / "icon_cache"
+METRICS_TEXTFILE_INTERVAL = 30
 
 
 def _resource_root() -> Path:
@@ -72,188 +50,22 @@ def _resolve_icon_path() -> Path | None:
     return None
 
 
-class ModelManager:
-    def __init__(self, path: Path):
-        self.path = path
-        self.lock = threading.Lock()
-        self.models = []
-        self.active = None
-        self._load()
-
-    def _load(self) -> None:
-        if not self.path.exists():
-            self.models = DEFAULT_MODELS.copy()
-            self.active = self.models[0]["name"] if self.models else None
-            self._save()
-            return
-        with self.path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-        self.models = [
-            self._normalize_model(m)
-            for m in data.get("models", [])
-            if isinstance(m, dict) and m.get("name") and m.get("endpoint")
-        ]
-        if not self.models:
-            self.models = DEFAULT_MODELS.copy()
-        self.active = data.get("active")
-        if self.active and not any(m["name"] == self.active for m in self.models):
-            self.active = self.models[0]["name"] if self.models else None
-        if self.active is None and self.models:
-            self.active = self.models[0]["name"]
-        self._save()
-
-    def _save(self) -> None:
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        with self.path.open("w", encoding="utf-8") as f:
-            json.dump({"models": self.models, "active": self.active}, f, indent=2)
-
-    def list_models(self):
-        with self.lock:
-            return list(self.models)
-
-    def add_model(self, model):
-        with self.lock:
-            model = self._normalize_model(model)
-            if any(m["name"] == model["name"] for m in self.models):
-                raise ValueError(f"Модель {model['name']} уже существует")
-            self.models.append(model)
-            if not self.active:
-                self.active = model["name"]
-            self._save()
-
-    def clone_model(self, name: str) -> dict:
-        with self.lock:
-            source_model = next((m for m in self.models if m["name"] == name), None)
-            if not source_model:
-                raise ValueError("Модель не найдена")
-            clone = dict(source_model)
-            clone["name"] = self._make_copy_name(name)
-            self.models.append(clone)
-            self._save()
-            return clone
-
-    def remove_model(self, name: str):
-        with self.lock:
-            self.models = [m for m in self.models if m["name"] != name]
-            if self.active == name:
-                self.active = self.models[0]["name"] if self.models else None
-            self._save()
-
-    def set_active(self, name: str):
-        with self.lock:
-            model = next((m for m in self.models if m["name"] == name), None)
-            if not model:
-                raise ValueError("Модель не найдена")
-            self.active = name
-            self._save()
-        self._write_claude_settings(model)
-
-    def activate_browserless(self, name: str) -> Path:
-        with self.lock:
-            model = next((m for m in self.models if m["name"] == name), None)
-            if not model:
-                raise ValueError("Модель не найдена")
-            if not str(model.get("api_key", "")).strip():
-                raise ValueError(
-                    "Для режима без браузера нужен API ключ. "
-                    "Добавь ключ в модель и попробуй снова."
-                )
-            self.active = name
-            self._save()
-        return self._write_claude_settings(model, force_console_login=True, force_api_key_auth=True)
-
-    def is_active(self, name: str) -> bool:
-        with self.lock:
-            return self.active == name
-
-    def update_model(self, old_name: str, new_model: dict):
-        with self.lock:
-            new_model = self._normalize_model(new_model)
-            found = False
-            for idx, m in enumerate(self.models):
-                if m["name"] == old_name:
-                    self.models[idx] = new_model
-                    found = True
-                    break
-            if not found:
-                raise ValueError("Модель не найдена")
-            # ensure unique names
-            if sum(1 for m in self.models if m["name"] == new_model["name"]) > 1:
-                raise ValueError(f"Модель {new_model['name']} уже существует")
-            if self.active == old_name:
-                self.active = new_model["name"]
-            self._save()
-        self._write_claude_settings(new_model)
-
-    def _normalize_model(self, model: dict) -> dict:
-        norm = {**DEFAULT_ENV}
-        norm.update(model)
-        return norm
-
-    def _make_copy_name(self, source_name: str) -> str:
-        existing_names = {m["name"] for m in self.models}
-        base_name = f"{source_name} копия"
-        if base_name not in existing_names:
-            return base_name
-        index = 2
-        while True:
-            candidate = f"{base_name} {index}"
-            if candidate not in existing_names:
-                return candidate
-            index += 1
-
-    def _write_claude_settings(
-        self,
-        model: dict,
-        *,
-        force_console_login: bool = False,
-        force_api_key_auth: bool = False,
-    ) -> Path:
-        CLAUDE_SETTINGS_PATH.parent.mkdir(parents=True, exist_ok=True)
-        data = {}
-        if CLAUDE_SETTINGS_PATH.exists():
-            try:
-                data = json.loads(CLAUDE_SETTINGS_PATH.read_text(encoding="utf-8"))
-            except Exception:
-                data = {}
-        env = data.get("env", {})
-        model_api_key = str(model.get("api_key", "")).strip()
-        existing_auth_token = str(env.get("ANTHROPIC_AUTH_TOKEN", "")).strip()
-        existing_api_key = str(env.get("ANTHROPIC_API_KEY", "")).strip()
-        # Если у модели пустой ключ, сохраняем текущий токен, чтобы не ломать уже
-        # пройденную OAuth-авторизацию в Claude Code.
-        auth_token = model_api_key or existing_auth_token
-        if force_api_key_auth:
-            auth_token = model_api_key
-        api_key = model_api_key or existing_api_key
-        if force_api_key_auth:
-            api_key = model_api_key
-        env.update(
-            {
-                "CLAUDE_CODE_ENABLE_TELEMETRY": model.get("CLAUDE_CODE_ENABLE_TELEMETRY", ""),
-                "CLAUDE_CODE_DISABLE_NONESSENTIAL_TRAFFIC": model.get("CLAUDE_CODE_DISABLE_NONESSENTIAL_TRAFFIC", ""),
-                "HTTP_PROXY": model.get("HTTP_PROXY", ""),
-                "ANTHROPIC_API_KEY": api_key,
-                "ANTHROPIC_AUTH_TOKEN": auth_token,
-                "ANTHROPIC_BASE_URL": model.get("endpoint", ""),
-                "ANTHROPIC_DEFAULT_HAIKU_MODEL": model.get("ANTHROPIC_DEFAULT_HAIKU_MODEL", ""),
-                "ANTHROPIC_DEFAULT_SONNET_MODEL": model.get("ANTHROPIC_DEFAULT_SONNET_MODEL", ""),
-                "ANTHROPIC_DEFAULT_OPUS_MODEL": model.get("ANTHROPIC_DEFAULT_OPUS_MODEL", ""),
-            }
-        )
-        data["env"] = env
-        if force_console_login:
-            data["forceLoginMethod"] = "console"
-        CLAUDE_SETTINGS_PATH.write_text(json.dumps(data, indent=2), encoding="utf-8")
-        return CLAUDE_SETTINGS_PATH
-
-
 class ModelDialog:
-    def __init__(self, master: tk.Tk, title: str, initial: dict | None = None):
+    def __init__(
+        self,
+        master: tk.Tk,
+        title: str,
+        initial: dict | None = None,
+        catalog_cache: CatalogCache | None = None,
+        catalog_index: CatalogIndex | None = None,
+    ):
         self.window = tk.Toplevel(master)
         self.window.title(title)
         self.window.grab_set()
         self.result = None
+        self.catalog_cache = catalog_cache
+        self.catalog_index = catalog_index
+        self.base_name = initial.get("base") if initial else None
         self._loading_models = False
 
         frm = ttk.Frame(self.window, padding=12)
@@ -313,6 +125,10 @@ class ModelDialog:
         opus_entry = ttk.Combobox(frm, textvariable=self.opus_var, width=35)
         opus_entry.grid(row=8, column=1, sticky=tk.EW, pady=4)
         self._model_comboboxes = [haiku_entry, sonnet_entry, opus_entry]
+        self._model_index = None
+        self._typeaheads = {}
+        for combo in self._model_comboboxes:
+            combo.bind("<KeyRelease>", self._on_model_combo_typed, add="+")
         self._seed_model_combobox_values()
 
         self._entries = [
@@ -339,6 +155,7 @@ class ModelDialog:
         frm.columnconfigure(1, weight=1)
         self.window.bind("<Return>", lambda _: self._on_save())
         self.window.bind("<Escape>", lambda _: self.window.destroy())
+        self._prefill_from_cache()
 
     def _seed_model_combobox_values(self):
         unique_values = []
@@ -356,63 +173,134 @@ class ModelDialog:
         values = tuple(self.available_model_ids)
         for combo in self._model_comboboxes:
             combo["values"] = values
+        if self._model_index is not None:
+            self._model_index.sync(self.available_model_ids)
+
+    def _on_model_combo_typed(self, event):
+        # Стрелки, Enter и модификаторы не меняют текст; фильтруем только после ввода или удаления символов.
+        if not event.char and event.keysym not in ("BackSpace", "Delete"):
+            return
+        combo = event.widget
+        query = combo.get().strip()
+        if self._model_index is None:
+            from model_search import ModelIdIndex, load_recent_models
+
+            # Индекс строится при первом вводе, а не при загрузке каталога, которая может и не понадобиться.
+            self._model_index = ModelIdIndex(self.available_model_ids, recent=load_recent_models())
+        if not query or query in self._model_index:
+            combo["values"] = tuple(self.available_model_ids)
+            return
+        typeahead = self._typeaheads.get(combo)
+        if typeahead is None:
+            from model_search import Typeahead
+
+            typeahead = self._typeaheads[combo] = Typeahead(self._model_index)
+        combo["values"] = tuple(typeahead.update(query))
 
     def _build_models_url(self, endpoint: str) -> str:
-        parsed = urllib_parse.urlparse(endpoint)
-        if not parsed.scheme or not parsed.netloc:
-            raise ValueError("Endpoint должен быть корректным URL, например https://api.anthropic.com")
+        return build_models_url(endpoint)
+
+    def _cached_catalog(self, endpoint: str, api_key: str) -> dict | None:
+        if self.catalog_cache is None or not endpoint:
+            return None
+        try:
+            url = self._build_models_url(endpoint)
+        except ValueError:
+            return None
+        return self.catalog_cache.get(url, api_key)
 
-        base = endpoint.rstrip("/")
-        if base.endswith("/v1"):
-            return f"{base}/models"
-        return f"{base}/v1/models"
+    def _prefill_from_cache(self):
+        endpoint = self.endpoint_var.get().strip()
+        api_key = self.key_var.get().strip()
+        cached = self._cached_catalog(endpoint, api_key)
+        if not cached or not cached["model_ids"]:
+            return
+        self.available_model_ids = cached["model_ids"]
+        self._update_model_combobox_values()
+        self.models_status_var.set(f"Из кэша: {len(cached['model_ids'])}")
+        if not self.catalog_cache.is_fresh(cached):
+            # stale-while-revalidate: показываем кэш сразу, обновляем в фоне.
+            self._on_load_models(background=True)
 
-    def _fetch_models(self, endpoint: str, api_key: str) -> list[str]:
+    def _fetch_models(self, endpoint: str, api_key: str, proxy: str = "", on_progress=None) -> dict:
         url = self._build_models_url(endpoint)
-        headers = {"anthropic-version": "2023-06-01"}
-        if api_key:
-            headers["x-api-key"] = api_key
-        req = urllib_request.Request(url=url, headers=headers, method="GET")
-        with urllib_request.urlopen(req, timeout=12) as response:
-            payload = json.loads(response.read().decode("utf-8"))
-
-        rows = payload.get("data", payload) if isinstance(payload, dict) else payload
-        if not isinstance(rows, list):
-            raise ValueError("Некорректный формат ответа /v1/models")
-        model_ids = [row.get("id") for row in rows if isinstance(row, dict) and row.get("id")]
-        if not model_ids:
-            raise ValueError("Список моделей пуст или недоступен для этого ключа")
-        return model_ids
-
-    def _on_load_models(self):
+        cached = self.catalog_cache.get(url, api_key) if self.catalog_cache else None
+        # catalog_fetch тянет http.client и ssl — импортируем только при первом запросе.
+        from catalog_fetch import fetch_model_ids
+
+        result = fetch_model_ids(url, api_key, proxy=proxy, cached=cached, on_progress=on_progress)
+        if result["truncated"]:
+            # Неполный список показываем, но не кэшируем и не индексируем как весь каталог.
+            return result
+        if self.catalog_cache is not None:
+            if result["not_modified"]:
+                self.catalog_cache.touch(url, api_key)
+            else:
+                self.catalog_cache.store(
+                    url,
+                    api_key,
+                    result["model_ids"],
+                    etag=result["etag"],
+                    last_modified=result["last_modified"],
+                )
+        if self.catalog_index is not None:
+            self.catalog_index.update(url, api_key, result["model_ids"])
+        return result
+
+    def _post_to_dialog(self, func):
+        try:
+            self.window.after(0, func)
+        except (tk.TclError, RuntimeError):
+            # Диалог уже закрыт — результат фоновой загрузки больше некому показать.
+            pass
+
+    def _on_load_models(self, background: bool = False):
         if self._loading_models:
             return
         endpoint = self.endpoint_var.get().strip()
         api_key = self.key_var.get().strip()
+        proxy = self.proxy_var.get().strip()
         if not endpoint:
-            messagebox.showerror("Проверка моделей", "Сначала укажите endpoint")
+            if not background:
+                messagebox.showerror("Проверка моделей", "Сначала укажите endpoint")
             return
 
+        if not background:
+            cached = self._cached_catalog(endpoint, api_key)
+            if cached and cached["model_ids"]:
+                self._apply_model_ids(cached["model_ids"])
+
         self._loading_models = True
         self.models_btn.config(state=tk.DISABLED)
-        self.models_status_var.set("Проверяю...")
+        self.models_status_var.set("Обновляю..." if background else "Проверяю...")
 
         def worker():
+            from http_client import HttpError
+
             try:
-                model_ids = self._fetch_models(endpoint, api_key)
-                self.window.after(0, lambda: self._on_models_loaded(model_ids))
-            except urllib_error.HTTPError as exc:
-                self.window.after(0, lambda: self._on_models_load_error(f"HTTP {exc.code}: {exc.reason}"))
-            except urllib_error.URLError as exc:
-                self.window.after(0, lambda: self._on_models_load_error(f"Сеть: {exc.reason}"))
+                result = self._fetch_models(
+                    endpoint,
+                    api_key,
+                    proxy,
+                    on_progress=lambda ids: self._post_to_dialog(lambda: self._on_models_progress(ids)),
+                )
+                self._post_to_dialog(
+                    lambda: self._on_models_loaded(
+                        result["model_ids"], background=background, truncated=result["truncated"]
+                    )
+                )
+            except HttpError as exc:
+                self._post_to_dialog(
+                    lambda: self._on_models_load_error(f"HTTP {exc.status}: {exc.reason}", background=background)
+                )
+            except OSError as exc:
+                self._post_to_dialog(lambda: self._on_models_load_error(f"Сеть: {exc}", background=background))
             except Exception as exc:
-                self.window.after(0, lambda: self._on_models_load_error(str(exc)))
+                self._post_to_dialog(lambda: self._on_models_load_error(str(exc), background=background))
 
         threading.Thread(target=worker, daemon=True).start()
 
-    def _on_models_loaded(self, model_ids: list[str]):
-        self._loading_models = False
-        self.models_btn.config(state=tk.NORMAL)
+    def _apply_model_ids(self, model_ids: list[str]):
         self.available_model_ids = model_ids
         self._update_model_combobox_values()
 
@@ -421,11 +309,35 @@ class ModelDialog:
             if not current or current not in model_ids:
                 model_var.set(model_ids[0])
 
-        self.models_status_var.set(f"Найдено: {len(model_ids)}")
+    def _on_models_progress(self, model_ids: list[str]):
+        if not self._loading_models:
+            return
+        # Промежуточный список только пополняет варианты; выбор моделей меняется по окончании загрузки.
+        self.available_model_ids = model_ids
+        self._update_model_combobox_values()
+        self.models_status_var.set(f"Загружено: {len(model_ids)}...")
 
-    def _on_models_load_error(self, error_text: str):
+    def _on_models_loaded(self, model_ids: list[str], background: bool = False, truncated: bool = False):
         self._loading_models = False
         self.models_btn.config(state=tk.NORMAL)
+        if background:
+            # Фоновая ревалидация не трогает выбор пользователя, только список значений.
+            self.available_model_ids = model_ids
+            self._update_model_combobox_values()
+        else:
+            self._apply_model_ids(model_ids)
+
+        if truncated:
+            self.models_status_var.set(f"Найдено: {len(model_ids)} (каталог загружен не полностью)")
+        else:
+            self.models_status_var.set(f"Найдено: {len(model_ids)}")
+
+    def _on_models_load_error(self, error_text: str, background: bool = False):
+        self._loading_models = False
+        self.models_btn.config(state=tk.NORMAL)
+        if background:
+            self.models_status_var.set("Кэш (не удалось обновить)")
+            return
         self.models_status_var.set("Ошибка проверки")
         messagebox.showerror("Проверка моделей", f"Не удалось получить список моделей: {error_text}")
 
@@ -453,6 +365,16 @@ class ModelDialog:
             "ANTHROPIC_DEFAULT_SONNET_MODEL": sonnet,
             "ANTHROPIC_DEFAULT_OPUS_MODEL": opus,
         }
+        if self.base_name:
+            # Поля формы совпадают с основой — профиль останется набором отличий от нее.
+            self.result["base"] = self.base_name
+        from model_search import remember_recent_models
+
+        try:
+            # Выбранные модели поднимаются наверх подсказок в следующих диалогах.
+            remember_recent_models([haiku, sonnet, opus])
+        except OSError:
+            pass
         self.window.destroy()
 
     def _install_shortcuts_and_menu(self):
@@ -517,34 +439,329 @@ class ModelDialog:
             return "break"  # stop default class binding to avoid double paste
         return None
 
+class DiagnosticsWindow:
+    """Счетчики и гистограммы длительности из metrics; экспорт в JSON и Prometheus."""
+
+    def __init__(self, master: tk.Tk):
+        self.window = tk.Toplevel(master)
+        self.window.title("Диагностика")
+        self.window.geometry("720x360")
+
+        frm = ttk.Frame(self.window, padding=12)
+        frm.pack(fill=tk.BOTH, expand=True)
+        frm.columnconfigure(0, weight=1)
+        frm.rowconfigure(1, weight=1)
+
+        self.enabled_var = tk.BooleanVar(value=metrics.enabled)
+        ttk.Checkbutton(
+            frm, text="Собирать метрики", variable=self.enabled_var, command=self._on_toggle
+        ).grid(row=0, column=0, sticky=tk.W, pady=(0, 6))
+
+        columns = ("name", "count", "avg", "p50", "p95", "max")
+        self.tree = ttk.Treeview(frm, columns=columns, show="headings", height=12)
+        self.tree.heading("name", text="Метрика")
+        self.tree.heading("count", text="Кол-во")
+        self.tree.heading("avg", text="Среднее")
+        self.tree.heading("p50", text="p50")
+        self.tree.heading("p95", text="p95")
+        self.tree.heading("max", text="Макс.")
+        self.tree.column("name", width=300, anchor=tk.W)
+        for column in columns[1:]:
+            self.tree.column(column, width=70, anchor=tk.E)
+        self.tree.grid(row=1, column=0, sticky=tk.NSEW)
+
+        btns = ttk.Frame(frm)
+        btns.grid(row=2, column=0, sticky=tk.E, pady=(10, 0))
+        ttk.Button(btns, text="Обновить", command=self.refresh).pack(side=tk.LEFT, padx=(0, 6))
+        ttk.Button(btns, text="Экспорт JSON…", command=lambda: self._export("json")).pack(side=tk.LEFT, padx=(0, 6))
+        ttk.Button(btns, text="Экспорт Prometheus…", command=lambda: self._export("prom")).pack(side=tk.LEFT)
+        self.refresh()
+
+    @staticmethod
+    def _format_seconds(value: float | None) -> str:
+        return "—" if value is None else f"{value * 1000:.1f} мс"
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        snapshot = metrics.snapshot()
+        for counter in snapshot["counters"]:
+            self.tree.insert("", tk.END, values=(_metric_label(counter), f"{counter['value']:g}", "", "", "", ""))
+        for histogram in snapshot["histograms"]:
+            avg = histogram["sum"] / histogram["count"] if histogram["count"] else None
+            self.tree.insert(
+                "",
+                tk.END,
+                values=(
+                    _metric_label(histogram),
+                    histogram["count"],
+                    self._format_seconds(avg),
+                    self._format_seconds(histogram["p50"]),
+                    self._format_seconds(histogram["p95"]),
+                    self._format_seconds(histogram["max"]),
+                ),
+            )
+
+    def _on_toggle(self):
+        metrics.enabled = self.enabled_var.get()
+
+    def _export(self, fmt: str):
+        from tkinter import filedialog
+
+        if fmt == "json":
+            path = filedialog.asksaveasfilename(
+                parent=self.window, defaultextension=".json", filetypes=[("JSON", "*.json")]
+            )
+        else:
+            path = filedialog.asksaveasfilename(
+                parent=self.window, defaultextension=".prom", filetypes=[("Prometheus textfile", "*.prom")]
+            )
+        if not path:
+            return
+        try:
+            if fmt == "json":
+                metrics.write_json(Path(path))
+            else:
+                metrics.write_prometheus(Path(path))
+        except OSError as exc:
+            messagebox.showerror("Диагностика", f"Не удалось сохранить метрики: {exc}", parent=self.window)
+
+
+def _metric_label(entry: dict) -> str:
+    labels = ", ".join(f"{key}={value}" for key, value in entry["labels"].items())
+    return f"{entry['name']} ({labels})" if labels else entry["name"]
+
+
+class TkDispatcher:
+    """Единая очередь команд из потоков pystray и воркеров в поток Tk.
+
+    Tk будится только когда в очереди появилась работа: на POSIX — байтом в pipe,
+    который слушает Tk file handler, иначе — одним root.after(0) на пачку команд.
+    Команды с одинаковым key, пришедшие до разбора очереди, схлопываются в одну.
+    """
+
+    def __init__(self, root: tk.Tk):
+        self.root = root
+        self._lock = threading.Lock()
+        self._queue: list[tuple] = []
+        self._keys: set[str] = set()
+        self._wake_pending = False
+        self._read_fd = None
+        self._write_fd = None
+        if os.name == "posix" and hasattr(root.tk, "createfilehandler"):
+            self._read_fd, self._write_fd = os.pipe()
+            os.set_blocking(self._read_fd, False)
+            os.set_blocking(self._write_fd, False)
+            root.tk.createfilehandler(self._read_fd, tk.READABLE, self._on_readable)
+
+    def post(self, func, *args, key: str | None = None) -> None:
+        with self._lock:
+            if key is not None:
+                if key in self._keys:
+                    return
+                self._keys.add(key)
+            self._queue.append((func, args))
+            if self._wake_pending:
+                return
+            self._wake_pending = True
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._write_fd is None:
+            self.root.after(0, self._drain)
+            return
+        try:
+            os.write(self._write_fd, b"\0")
+        except BlockingIOError:
+            # Pipe уже полон — Tk и так проснется.
+            pass
+
+    def _on_readable(self, fd, _mask) -> None:
+        try:
+            while os.read(fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        self._drain()
+
+    def _drain(self) -> None:
+        with self._lock:
+            batch = self._queue
+            self._queue = []
+            self._keys.clear()
+            self._wake_pending = False
+        for func, args in batch:
+            try:
+                func(*args)
+            except Exception:
+                self.root.report_callback_exception(*sys.exc_info())
+
+    def close(self) -> None:
+        if self._read_fd is None:
+            return
+        try:
+            self.root.tk.deletefilehandler(self._read_fd)
+        except tk.TclError:
+            pass
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+        self._read_fd = self._write_fd = None
+
+
 class App:
     def __init__(self, root: tk.Tk, manager: ModelManager):
         self.root = root
         self.manager = manager
         self._main_thread = threading.current_thread()
+        self.dispatcher = TkDispatcher(root)
+        self.fs_watcher = None
+        self.failover_router = None
+        self.gateway = None
+        self._metrics_stop = threading.Event()
         self.tray_icon = None
-        self._tk_icon = None
+        self._tk_icons = []
+        self.icon_cache = IconCache(ICON_CACHE_DIR, _resolve_icon_path())
+        self._tray_images = {}
+        self._tray_status = "base"
         self._pystray = None
         self._pillow_image = None
         self._pillow_draw = None
-        self._quit_requested = False
+        self._tray_active = None
+        self._tray_layout_key = None
+        self._tray_item_cache = {}
+        self._tray_group_cache = {}
+        self._tray_groups = {}
+        self._tray_group_of = {}
+        self._tray_static_items = None
+        self.probe_engine = ProbeEngine()
+        self._tree_models: dict[str, dict] = {}
+        self._tree_order: list[str] = []
+        self._tree_search_keys: dict[str, str] = {}
+        self._tree_active = None
+        self._tree_names: list[str] = []
+        self._tree_iids: dict[str, str] = {}
+        self._tree_iid_counter = 0
+        self._tree_row_cache: dict[str, tuple] = {}
+        self._tree_offset = 0
+        self._tree_virtual = False
+        self.catalog_cache = CatalogCache(CATALOG_CACHE_PATH)
+        self.catalog_index = CatalogIndex(CATALOG_INDEX_PATH)
+        self._model_filter: set[str] | None = None
+        self._refreshing_catalogs = False
+        self._probing = False
+        self._first_paint_done = False
         self._setup_ui()
-        # Delay tray startup to let Tk render the window first.
-        self.root.after(0, self._start_tray)
-        self._start_quit_checker()
+        tracer.mark("setup_ui")
+        # Иконки и трей не нужны для первого кадра: запускаем их после отрисовки окна.
+        self.root.bind("<Map>", self._on_root_mapped, add="+")
+        self.root.after(1000, self._on_first_paint)
+
+    def _on_root_mapped(self, event):
+        if event.widget is self.root and not self._first_paint_done:
+            self.root.after_idle(self._on_first_paint)
+
+    def _on_first_paint(self):
+        if self._first_paint_done:
+            return
+        self._first_paint_done = True
+        tracer.mark("first_paint")
+        self._set_window_icon()
+        self._start_tray()
+        self._start_fs_watcher()
+        self._start_failover()
+        self._start_gateway()
+        self._start_metrics_export()
+
+    def _start_fs_watcher(self):
+        self.fs_watcher = FileWatcher(
+            [self.manager.path, self.manager.journal.path, CLAUDE_SETTINGS_PATH],
+            self._on_files_changed,
+        )
+        self.fs_watcher.start()
+
+    def _start_failover(self):
+        from failover import FailoverConfig, FailoverRouter
+
+        config = FailoverConfig.load()
+        if not config.enabled or len(config.group) < 2:
+            return
+        self.failover_router = FailoverRouter(
+            self.manager,
+            self.probe_engine,
+            config,
+            on_switch=self._on_failover_switch,
+        )
+        self.failover_router.start()
+
+    def _start_gateway(self):
+        from core import read_gateway_config
+
+        if not read_gateway_config().get("enabled"):
+            return
+        from gateway import LocalGateway, ensure_gateway_config
+
+        config = ensure_gateway_config()
+        gateway = LocalGateway(self.manager, config["token"], int(config["port"]))
+        try:
+            gateway.start()
+        except OSError as exc:
+            messagebox.showerror("Локальный шлюз", f"Не удалось открыть порт {config['port']}: {exc}")
+            return
+        self.gateway = gateway
+        active = self.manager.active_model()
+        if active is not None:
+            # Один раз направляем claude на шлюз; дальше переключение не трогает settings.json.
+            self.manager._write_claude_settings(active)
+
+    def _start_metrics_export(self):
+        path = textfile_path()
+        if path is None:
+            return
+
+        def run():
+            while not self._metrics_stop.wait(METRICS_TEXTFILE_INTERVAL):
+                self._write_metrics_textfile(path)
+
+        threading.Thread(target=run, name="metrics-textfile", daemon=True).start()
+
+    @staticmethod
+    def _write_metrics_textfile(path: Path):
+        try:
+            metrics.write_prometheus(path)
+        except OSError:
+            # Каталог node-exporter мог пропасть; следующая попытка будет через интервал.
+            pass
+
+    def _on_failover_switch(self, previous: str, target: str, reason: str):
+        # Вызывается из потока роутера; settings.json уже записан через set_active.
+        self._request_refresh()
+        self._run_on_tk_thread(self._update_tray_status)
+
+    def _on_files_changed(self, changed: set):
+        # Вызывается из потока наблюдателя: разбор файлов идет здесь, в Tk уходит только refresh.
+        if CLAUDE_SETTINGS_PATH in changed:
+            _read_claude_env()
+        if changed & {self.manager.path, self.manager.journal.path} and self.manager.reload_if_changed():
+            self._request_refresh()
 
     def _run_on_tk_thread(self, func, *args, **kwargs):
         if threading.current_thread() is self._main_thread:
             func(*args, **kwargs)
             return
-        self.root.after(0, lambda: func(*args, **kwargs))
+        self.dispatcher.post(lambda: func(*args, **kwargs))
+
+    def _request_refresh(self):
+        """Просит обновить таблицу и трей; серия запросов до разбора очереди дает одно обновление."""
+        self.dispatcher.post(self._refresh_views, key="refresh")
+
+    def _refresh_views(self):
+        self._refresh_tree()
+        self._refresh_tray_menu()
 
     def _setup_ui(self):
         self.root.title("Переключатель моделей")
-        self.root.geometry("760x460")
-        self.root.minsize(620, 360)
+        self.root.geometry("900x460")
+        self.root.minsize(680, 360)
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
-        self._set_window_icon()
 
         style = ttk.Style()
         style.configure("TButton", padding=6)
@@ -568,24 +785,60 @@ class App:
         ttk.Separator(left, orient=tk.HORIZONTAL).pack(fill=tk.X, pady=(4, 8))
         ttk.Button(left, text="Экспорт в Claude Code", command=self._export_to_claude).pack(fill=tk.X)
         ttk.Button(left, text="Без браузера (API key)", command=self._activate_browserless).pack(fill=tk.X, pady=(6, 0))
+        ttk.Separator(left, orient=tk.HORIZONTAL).pack(fill=tk.X, pady=(8, 8))
+        self.probe_btn = ttk.Button(left, text="Проверить задержку", command=self._on_probe_latency)
+        self.probe_btn.pack(fill=tk.X)
+        ttk.Button(left, text="Диагностика", command=self._on_diagnostics).pack(fill=tk.X, pady=(6, 0))
 
         right = ttk.Frame(container)
         right.grid(row=0, column=1, sticky=tk.NSEW)
         right.columnconfigure(0, weight=1)
         right.rowconfigure(1, weight=1)
 
-        header = ttk.Label(right, text="Модели", font=("SF Pro Display", 12, "bold"))
-        header.grid(row=0, column=0, sticky=tk.W, pady=(0, 6))
-
-        columns = ("active", "name", "endpoint")
+        header_bar = ttk.Frame(right)
+        header_bar.grid(row=0, column=0, columnspan=2, sticky=tk.EW, pady=(0, 6))
+        header = ttk.Label(header_bar, text="Модели", font=("SF Pro Display", 12, "bold"))
+        header.pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(header_bar, textvariable=self.search_var, width=28)
+        search_entry.pack(side=tk.RIGHT)
+        search_entry.bind("<Escape>", lambda _: self.search_var.set(""))
+        ttk.Label(header_bar, text="Поиск").pack(side=tk.RIGHT)
+        self.search_var.trace_add("write", lambda *_: self._apply_tree_filter(reset_offset=True))
+        # Второе поле ищет не по профилям, а по id моделей из их каталогов.
+        self.model_query_var = tk.StringVar()
+        model_entry = ttk.Entry(header_bar, textvariable=self.model_query_var, width=22)
+        model_entry.pack(side=tk.RIGHT, padx=(0, 12))
+        model_entry.bind("<Escape>", lambda _: self.model_query_var.set(""))
+        ttk.Label(header_bar, text="Модель").pack(side=tk.RIGHT)
+        self.catalogs_btn = ttk.Button(header_bar, text="Обновить каталоги", command=self._on_refresh_catalogs)
+        self.catalogs_btn.pack(side=tk.RIGHT, padx=(0, 6))
+        self.model_match_var = tk.StringVar(value="")
+        ttk.Label(header_bar, textvariable=self.model_match_var).pack(side=tk.RIGHT)
+        self.model_query_var.trace_add("write", lambda *_: self._on_model_query_changed())
+
+        columns = ("active", "name", "endpoint", "latency_p50", "latency_last")
         self.tree = ttk.Treeview(right, columns=columns, show="headings", height=10)
         self.tree.heading("active", text="")
         self.tree.heading("name", text="Модель")
         self.tree.heading("endpoint", text="Endpoint / базовый URL")
+        self.tree.heading("latency_p50", text="p50")
+        self.tree.heading("latency_last", text="Последняя")
         self.tree.column("active", width=40, anchor=tk.CENTER)
         self.tree.column("name", width=150)
-        self.tree.column("endpoint", width=320)
+        self.tree.column("endpoint", width=260)
+        self.tree.column("latency_p50", width=70, anchor=tk.E)
+        self.tree.column("latency_last", width=90, anchor=tk.E)
         self.tree.grid(row=1, column=0, sticky=tk.NSEW)
+        self.tree_scroll = ttk.Scrollbar(right, orient=tk.VERTICAL, command=self._on_tree_scrollbar)
+        self.tree_scroll.grid(row=1, column=1, sticky=tk.NS)
+        self.tree.configure(yscrollcommand=self._on_tree_yview_changed)
+        self.tree.bind("<Configure>", self._on_tree_configure)
+        self.tree.bind("<MouseWheel>", self._on_tree_mousewheel)
+        self.tree.bind("<Button-4>", self._on_tree_mousewheel)
+        self.tree.bind("<Button-5>", self._on_tree_mousewheel)
+        self.tree.bind("<Up>", lambda _: self._on_tree_arrow(-1))
+        self.tree.bind("<Down>", lambda _: self._on_tree_arrow(1))
         self.tree.bind("<Double-1>", self._on_tree_double_click)
         self.tree.bind("<Button-2>", self._on_tree_right_click)
         self.tree.bind("<Button-3>", self._on_tree_right_click)
@@ -594,33 +847,71 @@ class App:
         self._actions_menu = tk.Menu(self.root, tearoff=0)
         self._actions_menu.add_command(label="Клонировать", command=self._on_clone_model)
         self._actions_menu.add_command(label="Сделать активной", command=self._on_make_active)
+        self._actions_menu.add_command(label="Активировать в проекте…", command=self._on_activate_in_project)
+        self._actions_menu.add_command(label="Скопировать export для shell", command=self._on_copy_shell_exports)
         self._actions_menu.add_separator()
         self._actions_menu.add_command(label="Удалить", command=self._on_delete)
 
         self._refresh_tree()
 
     def _open_model_dialog(self, title: str, initial: dict | None = None):
-        dialog = ModelDialog(self.root, title=title, initial=initial)
+        dialog = ModelDialog(
+            self.root,
+            title=title,
+            initial=initial,
+            catalog_cache=self.catalog_cache,
+            catalog_index=self.catalog_index,
+        )
         self.root.wait_window(dialog.window)
         return dialog.result
 
     def _start_tray(self):
         # Allow explicit tray disable on macOS when debugging UI/event-loop issues.
         if sys.platform == "darwin" and os.getenv("CCC_DISABLE_TRAY_ON_MAC") == "1":
+            tracer.mark("tray_disabled")
+            tracer.report()
             return
 
+        # Импорт PIL и масштабирование иконки идут в фоне, чтобы не блокировать Tk.
+        threading.Thread(target=self._prepare_tray_icon, daemon=True).start()
+
+    def _prepare_tray_icon(self):
         try:
-            import pystray
             from PIL import Image, ImageDraw
         except Exception:
             # Keep the app usable even if tray dependencies fail.
+            self._run_on_tk_thread(self._on_tray_unavailable)
             return
 
-        self._pystray = pystray
         self._pillow_image = Image
         self._pillow_draw = ImageDraw
+        images = {}
+        try:
+            if self.icon_cache.ensure():
+                # Бейджи статуса отрисованы заранее: смена состояния — просто подмена картинки.
+                images = {variant: self.icon_cache.load(TRAY_ICON_SIZE, variant) for variant in VARIANTS}
+        except Exception:
+            images = {}
+        if not images.get("base"):
+            images = {"base": self._generate_icon()}
+        self._run_on_tk_thread(self._launch_tray, images)
+
+    def _on_tray_unavailable(self):
+        tracer.mark("tray_unavailable")
+        tracer.report()
 
-        icon_image = self._generate_icon()
+    def _launch_tray(self, images: dict):
+        # pystray на macOS работает с AppKit, поэтому импортируем и создаем иконку в главном потоке.
+        try:
+            import pystray
+        except Exception:
+            self._on_tray_unavailable()
+            return
+
+        self._pystray = pystray
+        self._tray_images = images
+        self._tray_status = self._current_tray_status()
+        icon_image = images.get(self._tray_status) or images.get("base")
         menu = self._build_menu()
         self.tray_icon = pystray.Icon("model_switcher", icon_image, "Переключатель моделей", menu)
         if sys.platform == "darwin":
@@ -628,18 +919,41 @@ class App:
                 self.tray_icon.run_detached()
             except Exception:
                 self.tray_icon = None
-            return
-
-        thread = threading.Thread(target=self.tray_icon.run, daemon=True)
-        thread.start()
+        else:
+            thread = threading.Thread(target=self.tray_icon.run, daemon=True)
+            thread.start()
+        tracer.mark("tray_ready")
+        tracer.report()
+
+    def _current_tray_status(self) -> str:
+        last = self.probe_engine.last(self._tree_active) if self._tree_active else None
+        if last is None:
+            return "base"
+        return "active" if last.ok else "unreachable"
+
+    def _update_tray_status(self):
+        status = self._current_tray_status()
+        image = self._tray_images.get(status)
+        if self.tray_icon and image is not None and status != self._tray_status:
+            self.tray_icon.icon = image
+            self._tray_status = status
 
     def _set_window_icon(self):
+        # Кэш заполняется в фоне при старте трея; при промахе грузим исходник как раньше.
+        cached = [self.icon_cache.cached_path(size) for size in sorted(WINDOW_ICON_SIZES, reverse=True)]
+        if all(cached):
+            try:
+                self._tk_icons = [tk.PhotoImage(file=str(path)) for path in cached]
+                self.root.iconphoto(True, *self._tk_icons)
+                return
+            except Exception:
+                pass
         icon_path = _resolve_icon_path()
         if not icon_path:
             return
         try:
-            self._tk_icon = tk.PhotoImage(file=str(icon_path))
-            self.root.iconphoto(True, self._tk_icon)
+            self._tk_icons = [tk.PhotoImage(file=str(icon_path))]
+            self.root.iconphoto(True, *self._tk_icons)
         except Exception:
             # Keep app functional if Tk fails to load the png.
             pass
@@ -665,39 +979,92 @@ class App:
         draw.rectangle((size // 2 - 6, size // 2 - 6, size // 2 + 6, size // 2 + 6), fill=(30, 30, 36))
         return image
 
+    def _tray_layout(self, models: list[dict]) -> tuple:
+        """Структура меню: плоский список или группы по хосту endpoint-а."""
+        if len(models) <= TRAY_GROUP_THRESHOLD:
+            return ((None, tuple(m["name"] for m in models)),)
+        groups: dict[str, list[str]] = {}
+        for model in models:
+            host = urllib_parse.urlparse(str(model.get("endpoint", ""))).hostname
+            groups.setdefault(host or "Другие", []).append(model["name"])
+        return tuple((group, tuple(names)) for group, names in groups.items())
+
+    def _tray_model_item(self, name: str):
+        item = self._tray_item_cache.get(name)
+        if item is None:
+            item = self._pystray.MenuItem(
+                name,
+                lambda icon, item: self._set_active_from_tray(name),
+                # Состояние берем из снимка, снятого один раз на перерисовку, без блокировки.
+                checked=lambda item: self._tray_active == name,
+            )
+            self._tray_item_cache[name] = item
+        return item
+
+    def _tray_group_item(self, group: str):
+        item = self._tray_group_cache.get(group)
+        if item is None:
+            pystray = self._pystray
+
+            def label(item):
+                count = len(self._tray_groups.get(group, ()))
+                marker = "✓ " if self._tray_group_of.get(self._tray_active) == group else ""
+                return f"{marker}{group} ({count})"
+
+            # Подменю заполняется лениво: пункты группы достаются только при открытии.
+            item = pystray.MenuItem(label, pystray.Menu(lambda: self._tray_groups.get(group, ())))
+            self._tray_group_cache[group] = item
+        return item
+
     def _build_menu(self):
         if self._pystray is None:
             return None
         pystray = self._pystray
 
-        items = []
-        for model in self.manager.list_models():
-            name = model["name"]
-            # Create a closure that captures the name
-            def make_callback(model_name):
-                def callback(icon, item):
-                    self._set_active_from_tray(model_name)
-                return callback
-
-            def make_checked(model_name):
-                def checked_func(item):
-                    return self.manager.is_active(model_name)
-                return checked_func
-
-            items.append(pystray.MenuItem(
-                name,
-                make_callback(name),
-                checked=make_checked(name)
-            ))
-        items.append(pystray.Menu.SEPARATOR)
-        items.append(pystray.MenuItem("Открыть окно", lambda icon, item: self._bring_to_front()))
-        items.append(pystray.MenuItem("Выйти", lambda icon, item: self._quit_all()))
+        models, self._tray_active = self.manager.snapshot()
+        layout = self._tray_layout(models)
+        self._tray_layout_key = layout
+        live_names = {m["name"] for m in models}
+        self._tray_item_cache = {name: item for name, item in self._tray_item_cache.items() if name in live_names}
+        self._tray_group_of = {name: group for group, names in layout for name in names}
+
+        if len(layout) == 1 and layout[0][0] is None:
+            self._tray_groups = {}
+            self._tray_group_cache = {}
+            items = [self._tray_model_item(name) for name in layout[0][1]]
+        else:
+            self._tray_groups = {
+                group: tuple(self._tray_model_item(name) for name in names) for group, names in layout
+            }
+            self._tray_group_cache = {
+                group: item for group, item in self._tray_group_cache.items() if group in self._tray_groups
+            }
+            items = [self._tray_group_item(group) for group, _ in layout]
+
+        if self._tray_static_items is None:
+            self._tray_static_items = (
+                pystray.Menu.SEPARATOR,
+                pystray.MenuItem("Открыть окно", lambda icon, item: self._bring_to_front()),
+                pystray.MenuItem("Выйти", lambda icon, item: self._quit_all()),
+            )
+        items.extend(self._tray_static_items)
         return pystray.Menu(*items)
 
     def _refresh_tray_menu(self):
-        if self.tray_icon:
+        if not self.tray_icon:
+            return
+        with metrics.timer("tray_refresh_seconds"):
+            self._rebuild_tray_menu()
+
+    def _rebuild_tray_menu(self):
+        models, active = self.manager.snapshot()
+        # Если набор и порядок профилей не менялся, достаточно обновить снимок активной модели.
+        if self._tray_layout(models) == self._tray_layout_key:
+            self._tray_active = active
+        else:
             self.tray_icon.menu = self._build_menu()
-            self.tray_icon.update_menu()
+        self.tray_icon.update_menu()
+        self._update_tray_status()
 
     def _export_to_claude(self):
         selected = self.tree.selection()
@@ -706,7 +1073,7 @@ class App:
             return
         values = self.tree.item(selected[0], "values")
         name = values[1] if len(values) > 1 else values[0]
-        model = next((m for m in self.manager.list_models() if m["name"] == name), None)
+        model = self.manager.get_model(name)
         if not model:
             messagebox.showerror("Экспорт", "Модель не найдена")
             return
@@ -737,8 +1104,7 @@ class App:
         def apply_selection():
             try:
                 self.manager.set_active(name)
-                self._refresh_tree()
-                self._refresh_tray_menu()
+                self._request_refresh()
             except ValueError as exc:
                 messagebox.showerror("Ошибка", str(exc))
 
@@ -800,7 +1166,7 @@ class App:
             return
         values = self.tree.item(selected[0], "values")
         name = values[1] if len(values) > 1 else values[0]
-        model = next((m for m in self.manager.list_models() if m["name"] == name), None)
+        model = self.manager.get_model(name)
         if not model:
             messagebox.showerror("Ошибка", "Модель не найдена")
             return
@@ -859,6 +1225,49 @@ class App:
         self._refresh_tree()
         self._refresh_tray_menu()
 
+    def _selected_model(self) -> dict | None:
+        selected = self.tree.selection()
+        if not selected:
+            messagebox.showinfo("Выбор", "Выберите модель")
+            return None
+        values = self.tree.item(selected[0], "values")
+        name = values[1] if len(values) > 1 else values[0]
+        model = self.manager.get_model(name)
+        if not model:
+            messagebox.showerror("Выбор", "Модель не найдена")
+        return model
+
+    def _on_activate_in_project(self):
+        from tkinter import filedialog
+
+        from activation import write_project_settings
+
+        model = self._selected_model()
+        if model is None:
+            return
+        project_dir = filedialog.askdirectory(parent=self.root, title="Каталог проекта")
+        if not project_dir:
+            return
+        try:
+            target = write_project_settings(model, Path(project_dir))
+        except OSError as exc:
+            messagebox.showerror("Активация в проекте", f"Не удалось записать настройки: {exc}")
+            return
+        messagebox.showinfo(
+            "Активация в проекте",
+            f"Профиль {model['name']} записан в {target}.\nclaude, запущенный в этом проекте, будет использовать его; "
+            "глобальный settings.json не изменен.",
+        )
+
+    def _on_copy_shell_exports(self):
+        from activation import shell_exports
+
+        model = self._selected_model()
+        if model is None:
+            return
+        self.root.clipboard_clear()
+        self.root.clipboard_append(shell_exports(model))
+
     def _on_delete(self):
         selected = self.tree.selection()
         if not selected:
@@ -870,37 +1279,269 @@ class App:
         self._refresh_tree()
         self._refresh_tray_menu()
 
+    def _on_probe_latency(self):
+        if self._probing:
+            return
+        self._probing = True
+        self.probe_btn.config(state=tk.DISABLED)
+        models = self.manager.list_models()
+
+        def worker():
+            try:
+                self.probe_engine.probe_all(models)
+            finally:
+                self._run_on_tk_thread(self._on_probe_finished)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_diagnostics(self):
+        DiagnosticsWindow(self.root)
+
+    def _on_probe_finished(self):
+        self._probing = False
+        self.probe_btn.config(state=tk.NORMAL)
+        self._refresh_tree()
+        self._update_tray_status()
+
+    def _latency_columns(self, name: str) -> tuple[str, str]:
+        p50 = self.probe_engine.p50(name)
+        last = self.probe_engine.last(name)
+        p50_text = f"{p50:.0f} мс" if p50 is not None else "—"
+        if last is None:
+            last_text = "—"
+        elif not last.ok:
+            last_text = "ошибка"
+        else:
+            last_text = f"{last.total_ms:.0f} мс"
+        return p50_text, last_text
+
     def _refresh_tree(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-        for model in self.manager.list_models():
-            is_active = "✅" if self.manager.is_active(model["name"]) else ""
-            values = (is_active, model["name"], model["endpoint"])
-            row = self.tree.insert("", tk.END, values=values)
-            if self.manager.is_active(model["name"]):
-                self.tree.selection_set(row)
+        with metrics.timer("tree_refresh_seconds"):
+            self._rebuild_tree()
+
+    def _rebuild_tree(self):
+        models, active = self.manager.snapshot()
+        self._tree_models = {m["name"]: m for m in models}
+        self._tree_order = list(self._tree_models)
+        self._tree_search_keys = {m["name"]: f"{m['name']}\n{m.get('endpoint', '')}".casefold() for m in models}
+        self._tree_active = active
+        if len(self._tree_iids) > len(self._tree_models):
+            self._tree_iids = {name: iid for name, iid in self._tree_iids.items() if name in self._tree_models}
+        if self._model_filter is not None:
+            # Профили могли сменить endpoint или ключ — пересчитываем, кто обслуживает найденные модели.
+            self._update_model_filter()
+        self._apply_tree_filter(reset_offset=False)
+
+        active_iid = self._tree_iids.get(active)
+        if active_iid in self._tree_row_cache and self.tree.selection() != (active_iid,):
+            self.tree.selection_set(active_iid)
+
+    def _update_model_filter(self):
+        query = self.model_query_var.get().strip()
+        if not query:
+            self._model_filter = None
+            self.model_match_var.set("")
+            return
+        if self.catalog_index.is_empty():
+            # Первый запуск с индексом: берем каталоги, которые уже загружались в диалогах.
+            self.catalog_index.seed_from_cache(self.catalog_cache)
+        matches = self.catalog_index.query(query, list(self._tree_models.values()))
+        self._model_filter = {name for names in matches.values() for name in names}
+        if len(matches) == 1:
+            self.model_match_var.set(next(iter(matches)))
+        else:
+            self.model_match_var.set(f"моделей: {len(matches)}")
+
+    def _on_model_query_changed(self):
+        self._update_model_filter()
+        self._apply_tree_filter(reset_offset=True)
+
+    def _on_refresh_catalogs(self):
+        if self._refreshing_catalogs:
+            return
+        self._refreshing_catalogs = True
+        self.catalogs_btn.config(state=tk.DISABLED)
+        self.model_match_var.set("загрузка каталогов...")
+        models = self.manager.list_models()
+
+        def worker():
+            from catalog_index import refresh_catalogs
+
+            errors = refresh_catalogs(models, self.catalog_cache, self.catalog_index)
+            self._run_on_tk_thread(self._on_catalogs_refreshed, errors)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_catalogs_refreshed(self, errors: dict):
+        self._refreshing_catalogs = False
+        self.catalogs_btn.config(state=tk.NORMAL)
+        self._on_model_query_changed()
+        if errors:
+            details = "\n".join(f"{name}: {error}" for name, error in sorted(errors.items())[:10])
+            messagebox.showwarning("Каталоги моделей", f"Не удалось загрузить каталоги ({len(errors)}):\n{details}")
+
+    def _apply_tree_filter(self, reset_offset: bool):
+        query = self.search_var.get().strip().casefold()
+        if query:
+            self._tree_names = [name for name in self._tree_order if query in self._tree_search_keys[name]]
+        else:
+            self._tree_names = self._tree_order
+        if self._model_filter is not None:
+            self._tree_names = [name for name in self._tree_names if name in self._model_filter]
+        if reset_offset:
+            self._tree_offset = 0
+        self._render_tree_window()
+
+    def _tree_iid(self, name: str) -> str:
+        # Имена профилей не годятся в iid напрямую (скобки/пробелы в Tcl), поэтому выдаем свои.
+        iid = self._tree_iids.get(name)
+        if iid is None:
+            self._tree_iid_counter += 1
+            iid = self._tree_iids[name] = f"row{self._tree_iid_counter}"
+        return iid
+
+    def _tree_row_values(self, name: str) -> tuple:
+        model = self._tree_models[name]
+        is_active = "✅" if name == self._tree_active else ""
+        return (is_active, name, model.get("endpoint", ""), *self._latency_columns(name))
+
+    def _tree_window_size(self) -> int:
+        height = self.tree.winfo_height()
+        if height <= 1:
+            return int(self.tree.cget("height"))
+        try:
+            row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        except (tk.TclError, ValueError):
+            row_height = 20
+        return max(1, height // row_height)
+
+    def _render_tree_window(self):
+        names = self._tree_names
+        self._tree_virtual = len(names) > TREE_VIRTUALIZE_THRESHOLD
+        if self._tree_virtual:
+            window = self._tree_window_size()
+            self._tree_offset = min(max(self._tree_offset, 0), max(0, len(names) - window))
+            visible = names[self._tree_offset : self._tree_offset + window]
+        else:
+            self._tree_offset = 0
+            visible = names
+        self._reconcile_tree([(self._tree_iid(name), self._tree_row_values(name)) for name in visible])
+        if self._tree_virtual:
+            total = len(names)
+            self.tree_scroll.set(self._tree_offset / total, (self._tree_offset + len(visible)) / total)
+
+    def _reconcile_tree(self, desired: list[tuple[str, tuple]]):
+        """Приводит строки таблицы к desired, трогая только изменившиеся строки."""
+        wanted = {iid for iid, _ in desired}
+        stale = [iid for iid in self.tree.get_children() if iid not in wanted]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                self._tree_row_cache.pop(iid, None)
+
+        current = list(self.tree.get_children())
+        for index, (iid, values) in enumerate(desired):
+            if iid not in self._tree_row_cache:
+                self.tree.insert("", index, iid=iid, values=values)
+                current.insert(index, iid)
+            else:
+                if current[index] != iid:
+                    self.tree.move(iid, "", index)
+                    current.remove(iid)
+                    current.insert(index, iid)
+                if self._tree_row_cache[iid] != values:
+                    self.tree.item(iid, values=values)
+            self._tree_row_cache[iid] = values
+
+    def _scroll_tree_to(self, offset: int):
+        if offset != self._tree_offset:
+            self._tree_offset = offset
+            self._render_tree_window()
+
+    def _on_tree_scrollbar(self, *args):
+        if not self._tree_virtual:
+            self.tree.yview(*args)
+            return
+        total = len(self._tree_names)
+        window = self._tree_window_size()
+        if args[0] == "moveto":
+            self._scroll_tree_to(int(float(args[1]) * total))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (window if args[2] == "pages" else 1)
+            self._scroll_tree_to(self._tree_offset + step)
+
+    def _on_tree_yview_changed(self, first, last):
+        if not self._tree_virtual:
+            self.tree_scroll.set(first, last)
+
+    def _on_tree_configure(self, _event):
+        if self._tree_virtual:
+            self._render_tree_window()
+
+    def _on_tree_mousewheel(self, event):
+        if not self._tree_virtual:
+            return None
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            step = -3
+        else:
+            step = 3
+        self._scroll_tree_to(self._tree_offset + step)
+        return "break"
+
+    def _on_tree_arrow(self, step: int):
+        if not self._tree_virtual:
+            return None
+        children = self.tree.get_children()
+        if not children:
+            return None
+        edge = children[0] if step < 0 else children[-1]
+        if self.tree.focus() != edge:
+            return None
+        before = self._tree_offset
+        self._scroll_tree_to(self._tree_offset + step)
+        if self._tree_offset == before:
+            return "break"
+        children = self.tree.get_children()
+        edge = children[0] if step < 0 else children[-1]
+        self.tree.focus(edge)
+        self.tree.selection_set(edge)
+        return "break"
 
     def _on_close(self):
         self.root.withdraw()
 
-    def _start_quit_checker(self):
-        """Периодически проверяет флаг выхода в main thread."""
-        if self._quit_requested:
-            # Tray icon работает в daemon thread, завершится автоматически при выходе процесса.
-            # Не вызываем tray_icon.stop() - на macOS это вызывает краш при попытке
-            # удалить NSStatusItem из main thread (Must only be used from the main thread).
-            self.root.quit()
-            return
-        # Проверяем каждые 100ms
-        self.root.after(100, self._start_quit_checker)
+    def _quit_now(self):
+        # Tray icon работает в daemon thread, завершится автоматически при выходе процесса.
+        # Не вызываем tray_icon.stop() - на macOS это вызывает краш при попытке
+        # удалить NSStatusItem из main thread (Must only be used from the main thread).
+        if self.fs_watcher is not None:
+            self.fs_watcher.stop()
+        if self.failover_router is not None:
+            self.failover_router.stop()
+        if self.gateway is not None:
+            self.gateway.stop()
+        self._metrics_stop.set()
+        path = textfile_path()
+        if path is not None:
+            self._write_metrics_textfile(path)
+        self.dispatcher.close()
+        self.root.quit()
 
     def _quit_all(self):
         """Запрашивает выход из tray callback (может быть не в main thread)."""
-        self._quit_requested = True
+        self.dispatcher.post(self._quit_now, key="quit")
 
 
-if __name__ == "__main__":
+def main():
+    tracer.mark("imports")
     manager = ModelManager(DATA_PATH)
+    tracer.mark("model_manager_load")
     root = tk.Tk()
-    app = App(root, manager)
+    tracer.mark("tk_init")
+    App(root, manager)
     root.mainloop()
+    manager.compact()
+
+
+if __name__ == "__main__":
+    main()
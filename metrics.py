@@ -0,0 +1,207 @@
+"""Счетчики и гистограммы длительности операций хаба.
+
+Включается переменной окружения CCC_METRICS=1 или галочкой в окне
+«Диагностика». Выключенный реестр не берет блокировок и не создает объектов:
+timer() возвращает общий пустой контекст, inc() и observe() сразу выходят.
+Если задан CCC_METRICS_TEXTFILE, GUI периодически пишет туда снимок в формате
+Prometheus textfile для node-exporter (атомарно, через rename).
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from storage import atomic_write_text
+
+METRICS_ENV = "CCC_METRICS"
+TEXTFILE_ENV = "CCC_METRICS_TEXTFILE"
+METRIC_PREFIX = "ccc_hub_"
+# Границы гистограмм в секундах: от миллисекунды (запись settings.json) до секунд (медленный шлюз).
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        index = 0
+        while index < len(BUCKETS) and seconds > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.total += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float | None:
+        """Оценка квантиля по верхней границе корзины (как histogram_quantile без интерполяции)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return BUCKETS[index] if index < len(BUCKETS) else self.max
+        return self.max
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "started")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: dict):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        if exc_type is not None:
+            self.registry.inc(f"{self.name.removesuffix('_seconds')}_errors_total", **self.labels)
+        return False
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._histograms: dict[tuple[str, tuple], _Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self.lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self.lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def timer(self, name: str, **labels):
+        """with metrics.timer("store_save_seconds"): ... — длительность блока в гистограмму."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def reset(self) -> None:
+        with self.lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> dict:
+        """Копия всех метрик для окна диагностики и JSON-экспорта."""
+        with self.lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.total,
+                    "max": histogram.max,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "buckets": dict(zip([*map(str, BUCKETS), "+Inf"], histogram.counts)),
+                }
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def to_json(self) -> str:
+        return json.dumps({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), **self.snapshot()}, indent=2)
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self.lock:
+            counters = sorted(self._counters.items())
+            histograms = [
+                (name, labels, list(histogram.counts), histogram.total, histogram.count)
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+        typed = set()
+        for (name, labels), value in counters:
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+        for name, labels, counts, total, count in histograms:
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip([*map(str, BUCKETS), "+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: Path) -> None:
+        atomic_write_text(path, self.to_json(), fsync=False)
+
+    def write_prometheus(self, path: Path) -> None:
+        # node-exporter читает каталог textfile в любой момент — только атомарная замена.
+        atomic_write_text(path, self.to_prometheus(), fsync=False)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: tuple, **extra) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in pairs) + "}"
+
+
+def textfile_path() -> Path | None:
+    value = os.getenv(TEXTFILE_ENV, "").strip()
+    return Path(value).expanduser() if value else None
+
+
+_env_value = os.getenv(METRICS_ENV, "").strip()
+metrics = MetricsRegistry(enabled=(bool(_env_value) and _env_value != "0") or textfile_path() is not None)
@@ -0,0 +1,190 @@
+"""Быстрый поиск по id моделей из каталога для выпадающих списков Haiku/Sonnet/Opus.
+
+Индекс строится один раз на загруженный каталог (и дополняется, пока каталог
+приходит страницами): для каждого id запоминаются его триграммы и префиксы
+слов длиной 1-2 символа. Запрос из нескольких слов ищет id, содержащие все
+слова в любом порядке. Работа на нажатие клавиши зависит от числа совпадений,
+а не от размера каталога; если запрос лишь дописан, фильтруются прошлые
+совпадения. Первыми идут недавно выбранные модели, затем порядок каталога
+(API отдает новые модели раньше старых).
+"""
+
+import heapq
+import json
+import re
+
+from core import DATA_PATH
+from storage import atomic_write_text
+
+RECENT_MODELS_PATH = DATA_PATH.parent / "recent_models.json"
+RECENT_LIMIT = 30
+# Больше строк в выпадающем списке никто не листает, а Tk перерисовывает их все.
+MAX_RESULTS = 50
+_WORD_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class ModelIdIndex:
+    __slots__ = ("ids", "_lowered", "_positions", "_trigrams", "_prefixes", "_recent")
+
+    def __init__(self, ids=(), recent=()):
+        self._recent: dict[str, int] = {}
+        self._clear()
+        self.extend(ids)
+        self.set_recent(recent)
+
+    def _clear(self) -> None:
+        self.ids: list[str] = []
+        self._lowered: list[str] = []
+        self._positions: dict[str, int] = {}
+        self._trigrams: dict[str, set[int]] = {}
+        self._prefixes: dict[str, set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, model_id) -> bool:
+        return model_id in self._positions
+
+    def extend(self, ids) -> None:
+        """Добавляет новые id в индекс; уже известные пропускаются."""
+        for model_id in ids:
+            if model_id in self._positions:
+                continue
+            position = len(self.ids)
+            lowered = model_id.lower()
+            self.ids.append(model_id)
+            self._lowered.append(lowered)
+            self._positions[model_id] = position
+            for trigram in _trigrams(lowered):
+                self._trigrams.setdefault(trigram, set()).add(position)
+            for word in {lowered, *_WORD_SPLIT.split(lowered)}:
+                for size in (1, 2):
+                    if len(word) >= size:
+                        self._prefixes.setdefault(word[:size], set()).add(position)
+
+    def sync(self, ids: list[str]) -> None:
+        """Приводит индекс к списку ids: дописывает хвост или перестраивает, если список другой."""
+        known = len(self.ids)
+        if len(ids) >= known and ids[:known] == self.ids:
+            self.extend(ids[known:])
+            return
+        self._clear()
+        self.extend(ids)
+
+    def set_recent(self, recent) -> None:
+        self._recent = {model_id: rank for rank, model_id in enumerate(recent)}
+
+    def _candidates(self, word: str) -> set[int]:
+        if len(word) < 3:
+            return set(self._prefixes.get(word, ()))
+        postings = [self._trigrams.get(trigram) for trigram in _trigrams(word)]
+        if not all(postings):
+            return set()
+        postings.sort(key=len)
+        found = set(postings[0])
+        for posting in postings[1:]:
+            found &= posting
+            if not found:
+                break
+        # Триграммы могут встретиться в id вразброс — проверяем подстроку целиком.
+        return {position for position in found if word in self._lowered[position]}
+
+    def match(self, query: str, within: set[int] | None = None) -> set[int]:
+        """Позиции id, содержащих все слова запроса.
+
+        within — совпадения предыдущего, более короткого запроса: если новый
+        запрос его дописывает, достаточно отфильтровать их.
+        """
+        words = query.lower().split()
+        if not words:
+            return set(range(len(self.ids)))
+        if within is not None:
+            return {
+                position
+                for position in within
+                if all(self._word_matches(word, position) for word in words)
+            }
+        result = None
+        for word in sorted(words, key=len, reverse=True):
+            found = self._candidates(word)
+            result = found if result is None else result & found
+            if not result:
+                break
+        return result or set()
+
+    def _word_matches(self, word: str, position: int) -> bool:
+        if len(word) >= 3:
+            return word in self._lowered[position]
+        return position in self._prefixes.get(word, ())
+
+    def rank(self, positions: set[int], query: str, limit: int = MAX_RESULTS) -> list[str]:
+        """Лучшие limit id: недавно выбранные, затем совпадение с начала id, затем порядок каталога."""
+        first_word = query.lower().split()[0] if query.split() else ""
+        no_rank = len(self._recent)
+
+        def key(position: int) -> tuple:
+            return (
+                self._recent.get(self.ids[position], no_rank),
+                not self._lowered[position].startswith(first_word),
+                position,
+            )
+
+        return [self.ids[position] for position in heapq.nsmallest(limit, positions, key=key)]
+
+    def search(self, query: str, limit: int = MAX_RESULTS) -> list[str]:
+        return self.rank(self.match(query), query, limit)
+
+
+class Typeahead:
+    """Состояние поиска одного поля ввода: пока запрос только дописывается, фильтрует прошлые совпадения."""
+
+    __slots__ = ("index", "_query", "_matches", "_indexed")
+
+    def __init__(self, index: ModelIdIndex):
+        self.index = index
+        self._query = ""
+        self._matches = None
+        self._indexed = 0
+
+    def update(self, query: str, limit: int = MAX_RESULTS) -> list[str]:
+        within = None
+        if (
+            self._matches is not None
+            and self._indexed == len(self.index)
+            and query.startswith(self._query)
+            and self._narrows(self._query)
+        ):
+            within = self._matches
+        self._matches = self.index.match(query, within)
+        self._query = query
+        self._indexed = len(self.index)
+        return self.index.rank(self._matches, query, limit)
+
+    @staticmethod
+    def _narrows(previous: str) -> bool:
+        # Слово короче 3 символов ищется по началу слов, длиннее — как подстрока:
+        # на этой границе прошлые совпадения уже не надмножество новых.
+        words = previous.split()
+        return bool(words) and (previous[-1].isspace() or len(words[-1]) >= 3)
+
+
+def load_recent_models() -> list[str]:
+    try:
+        data = json.loads(RECENT_MODELS_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+    return [str(model_id) for model_id in data] if isinstance(data, list) else []
+
+
+def remember_recent_models(model_ids) -> list[str]:
+    """Поднимает выбранные id в начало списка недавних и сохраняет его."""
+    recent = load_recent_models()
+    chosen = [model_id for model_id in dict.fromkeys(model_ids) if model_id]
+    updated = (chosen + [model_id for model_id in recent if model_id not in chosen])[:RECENT_LIMIT]
+    if updated != recent:
+        atomic_write_text(RECENT_MODELS_PATH, json.dumps(updated, ensure_ascii=False), fsync=False)
+    return updated
@@ -0,0 +1,177 @@
+"""Параллельная проверка задержки endpoint-ов всех профилей."""
+
+import threading
+import time
+from collections import deque
+from urllib import parse as urllib_parse
+
+from metrics import metrics
+
+PROBE_TIMEOUT = 8
+PROBE_MAX_WORKERS = 8
+PROBE_HISTORY_SIZE = 20
+ANTHROPIC_VERSION = "2023-06-01"
+
+
+def build_models_url(endpoint: str) -> str:
+    parsed = urllib_parse.urlparse(endpoint)
+    if not parsed.scheme or not parsed.netloc:
+        raise ValueError("Endpoint должен быть корректным URL, например https://api.anthropic.com")
+
+    base = endpoint.rstrip("/")
+    if base.endswith("/v1"):
+        return f"{base}/models"
+    return f"{base}/v1/models"
+
+
+def _ms_since(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+class ProbeResult:
+    __slots__ = (
+        "name",
+        "url",
+        "dns_ms",
+        "connect_ms",
+        "tls_ms",
+        "first_byte_ms",
+        "total_ms",
+        "status",
+        "error",
+        "warm",
+    )
+
+    def __init__(self, name: str, url: str, error: str = ""):
+        self.name = name
+        self.url = url
+        self.dns_ms: float | None = None
+        self.connect_ms: float | None = None
+        self.tls_ms: float | None = None
+        self.first_byte_ms: float | None = None
+        self.total_ms: float | None = None
+        self.status: int | None = None
+        self.error = error
+        # True — соединение из пула или возобновленная TLS-сессия: фазы подключения не замерены целиком.
+        self.warm = False
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+
+def probe_endpoint(
+    name: str,
+    endpoint: str,
+    api_key: str = "",
+    timeout: float = PROBE_TIMEOUT,
+    *,
+    proxy: str = "",
+    client=None,
+) -> ProbeResult:
+    """Делает один GET /v1/models на новом соединении и замеряет DNS, TCP, TLS и первый байт.
+
+    По умолчанию используется клиент без пула и кэшей (http_client.probe_client).
+    Если передан клиент с пулом и соединение оказалось переиспользованным,
+    результат помечается warm, а фазы подключения остаются None.
+    HTTP-ошибки (например 401) не считаются сбоем: сервер ответил, задержка валидна.
+    """
+    try:
+        url = build_models_url(endpoint)
+    except ValueError as exc:
+        return ProbeResult(name=name, url=endpoint, error=str(exc))
+
+    if client is None:
+        # http.client и ssl подгружаются только при первой проверке, а не при старте GUI.
+        from http_client import probe_client
+
+        client = probe_client()
+    result = ProbeResult(name=name, url=url)
+    headers = {"anthropic-version": ANTHROPIC_VERSION, "Accept": "application/json"}
+    if api_key:
+        headers["x-api-key"] = api_key
+    started = time.perf_counter()
+    try:
+        with client.get(url, headers=headers, proxy=proxy, timeout=timeout) as response:
+            result.total_ms = _ms_since(started)
+            result.status = response.status
+            timings = response.timings
+            result.dns_ms = timings.get("dns_ms")
+            result.connect_ms = timings.get("connect_ms")
+            result.tls_ms = timings.get("tls_ms")
+            result.first_byte_ms = timings.get("response_ms")
+            result.warm = response.reused or bool(timings.get("tls_resumed"))
+            response.read()
+    except Exception as exc:
+        # OSError, ValueError и http.client.HTTPException при разборе ответа.
+        result.error = str(exc) or exc.__class__.__name__
+    return result
+
+
+class ProbeEngine:
+    """Проверяет все профили одновременно и хранит историю задержек по имени профиля."""
+
+    def __init__(
+        self,
+        max_workers: int = PROBE_MAX_WORKERS,
+        history_size: int = PROBE_HISTORY_SIZE,
+        timeout: float = PROBE_TIMEOUT,
+        client=None,
+    ):
+        self.max_workers = max_workers
+        self.client = client
+        self.history_size = history_size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self._history: dict[str, deque] = {}
+        self._last: dict[str, ProbeResult] = {}
+
+    def probe_all(self, models: list[dict]) -> list[ProbeResult]:
+        targets = [
+            (m["name"], str(m.get("endpoint", "")), str(m.get("api_key", "")).strip(), str(m.get("HTTP_PROXY", "")))
+            for m in models
+        ]
+        if not targets:
+            return []
+        from concurrent.futures import ThreadPoolExecutor
+
+        workers = max(1, min(self.max_workers, len(targets)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="probe") as pool:
+            results = list(
+                pool.map(
+                    lambda t: probe_endpoint(t[0], t[1], t[2], timeout=self.timeout, proxy=t[3], client=self.client),
+                    targets,
+                )
+            )
+        with self.lock:
+            for result in results:
+                self._record(result)
+        return results
+
+    def _record(self, result: ProbeResult) -> None:
+        self._last[result.name] = result
+        metrics.inc("probe_results_total", result="ok" if result.ok else "error")
+        if result.ok and result.total_ms is not None:
+            history = self._history.setdefault(result.name, deque(maxlen=self.history_size))
+            history.append(result.total_ms)
+            metrics.observe("probe_seconds", result.total_ms / 1000, profile=result.name)
+
+    def last(self, name: str) -> ProbeResult | None:
+        with self.lock:
+            return self._last.get(name)
+
+    def p50(self, name: str) -> float | None:
+        with self.lock:
+            history = self._history.get(name)
+            if not history:
+                return None
+            ordered = sorted(history)
+        middle = len(ordered) // 2
+        if len(ordered) % 2:
+            return ordered[middle]
+        return (ordered[middle - 1] + ordered[middle]) / 2
+
+    def forget(self, name: str) -> None:
+        with self.lock:
+            self._history.pop(name, None)
+            self._last.pop(name, None)
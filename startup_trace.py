@@ -0,0 +1,55 @@
+"""Трассировка фаз запуска GUI.
+
+Включается переменной окружения CCC_STARTUP_TRACE: "1" пишет отчет в
+~/.config/ccc_hub/startup_trace.log, любое другое значение считается путем к файлу.
+Отчет также печатается в stderr. Модуль без зависимостей, чтобы его можно было
+импортировать первым и начать отсчет как можно раньше.
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+TRACE_ENV = "CCC_STARTUP_TRACE"
+
+
+class StartupTracer:
+    def __init__(self):
+        self._started = time.perf_counter()
+        self._last = self._started
+        self._phases: list[tuple[str, float, float]] = []
+        self._reported = False
+        value = os.getenv(TRACE_ENV, "").strip()
+        self.enabled = bool(value) and value != "0"
+        if value == "1":
+            self.path = Path.home() / ".config" / "ccc_hub" / "startup_trace.log"
+        else:
+            self.path = Path(value).expanduser() if self.enabled else None
+
+    def mark(self, phase: str) -> None:
+        """Закрывает фазу: время с предыдущей отметки и с начала запуска."""
+        if not self.enabled or self._reported:
+            return
+        now = time.perf_counter()
+        self._phases.append((phase, (now - self._last) * 1000, (now - self._started) * 1000))
+        self._last = now
+
+    def report(self) -> None:
+        if not self.enabled or self._reported:
+            return
+        self._reported = True
+        lines = [f"startup trace {time.strftime('%Y-%m-%d %H:%M:%S')} pid={os.getpid()}"]
+        for phase, duration_ms, elapsed_ms in self._phases:
+            lines.append(f"  {phase:<22} {duration_ms:8.1f} ms   @ {elapsed_ms:8.1f} ms")
+        text = "\n".join(lines) + "\n"
+        print(text, end="", file=sys.stderr)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(text)
+        except OSError:
+            pass
+
+
+tracer = StartupTracer()
@@ -0,0 +1,193 @@
+"""Атомарная запись файлов и журнал изменений для хранилища профилей."""
+
+import json
+import os
+import stat
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def file_signature(path: Path) -> tuple | None:
+    """Дешевый отпечаток файла по stat: меняется при записи или замене через rename."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def _fsync_dir(directory: Path) -> None:
+    # На Windows каталоги нельзя открыть для fsync; там os.replace и так надежен.
+    if os.name == "nt":
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_text(path: Path, text: str, *, fsync: bool = True, mode: int | None = None) -> None:
+    """Пишет файл через временный файл + rename: читатель видит либо старую, либо новую версию.
+
+    Симлинк не подменяется обычным файлом: пишем по месту его цели. Права
+    существующего файла переносятся на новый (settings.json хранит ключи API);
+    mode задает права явно. Они выставляются временному файлу до записи
+    содержимого, так что секрет ни в какой момент не лежит с правами umask.
+    """
+    if path.is_symlink():
+        path = path.resolve()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Свое имя временного файла у каждого потока и процесса: параллельные писатели не портят чужой.
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    if mode is None:
+        try:
+            mode = stat.S_IMODE(path.stat().st_mode)
+        except OSError:
+            pass
+    try:
+        with tmp_path.open("w", encoding="utf-8") as f:
+            if mode is not None:
+                os.chmod(tmp_path, mode)
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    if fsync:
+        _fsync_dir(path.parent)
+
+
+class FileLock:
+    """Межпроцессная эксклюзивная блокировка на отдельном файле (flock, на Windows — msvcrt).
+
+    Файл открывается один раз и остается открытым; сама блокировка берется только
+    на время with-блока. Внутри процесса потоки должны сериализоваться своим
+    threading.Lock: блокировка принадлежит открытому файлу, а не потоку.
+    """
+
+    # msvcrt.locking не умеет ждать бесконечно — опрашиваем с этим шагом.
+    _POLL_INTERVAL = 0.005
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd = None
+
+    def _open(self) -> int:
+        if self._fd is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        return self._fd
+
+    def acquire(self) -> None:
+        fd = self._open()
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            return
+        while True:
+            try:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                time.sleep(self._POLL_INTERVAL)
+
+    def try_acquire(self) -> bool:
+        """Берет блокировку без ожидания; False — если ее держит кто-то другой."""
+        fd = self._open()
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def release(self) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+        return False
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class MutationJournal:
+    """Append-only журнал в формате JSON Lines.
+
+    Каждая запись дописывается одной строкой с fsync. Оборванная при сбое
+    последняя строка при чтении отбрасывается вместе со всем, что после нее.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def read(self) -> tuple[list[dict], bool]:
+        """Возвращает записи журнала и признак того, что файл прочитан без повреждений."""
+        entries = []
+        try:
+            raw = self.path.read_bytes()
+        except FileNotFoundError:
+            self._count = 0
+            return entries, True
+        clean = True
+        for line in raw.split(b"\n"):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                clean = False
+                break
+            if not isinstance(entry, dict):
+                clean = False
+                break
+            entries.append(entry)
+        self._count = len(entries)
+        return entries, clean
+
+    def append(self, entry: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._count += 1
+
+    def reset(self) -> None:
+        self.path.unlink(missing_ok=True)
+        self._count = 0
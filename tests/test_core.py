@@ -0,0 +1,42 @@
+"""Регрессионные проверки хранилища профилей (запуск: python -m unittest discover tests)."""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import core
+
+
+class BaseChainTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        patcher = mock.patch.object(core, "CLAUDE_SETTINGS_PATH", self.dir / "settings.json")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = core.ModelManager(self.dir / "models.json")
+        self.manager.add_model({"name": "A", "endpoint": "https://a.example"})
+        self.manager.add_model({"name": "B", "base": "A"})
+
+    def test_rename_with_base_pointing_back_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.manager.update_model("A", {"name": "A2", "endpoint": "https://a.example", "base": "B"})
+
+        reloaded = core.ModelManager(self.dir / "models.json")
+        self.assertEqual(reloaded.get_model("A")["endpoint"], "https://a.example")
+        self.assertEqual(reloaded.get_model("B").base_name, "A")
+        self.assertEqual(reloaded.get_model("B")["endpoint"], "https://a.example")
+        self.assertIsNone(reloaded.get_model("A2"))
+
+    def test_rename_of_base_keeps_dependents(self):
+        self.manager.update_model("A", {"name": "A2", "endpoint": "https://a2.example"})
+
+        reloaded = core.ModelManager(self.dir / "models.json")
+        self.assertEqual(reloaded.get_model("B").base_name, "A2")
+        self.assertEqual(reloaded.get_model("B")["endpoint"], "https://a2.example")
+
+
+if __name__ == "__main__":
+    unittest.main()